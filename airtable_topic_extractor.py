@@ -4,20 +4,42 @@ Reads InfoText from Airtable records, extracts professional interests with relat
 """
 
 import os
+import re
 import time
+import asyncio
+import logging
 import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from pyairtable import Api
-from nlp import extract_interests_with_relationships
-from graph import update_knowledge_graph_with_relationships
 
-# Load environment variables
+# Load environment variables before the project imports below, which read
+# settings (OpenAI limits, Neo4j pool size) at import time
 load_dotenv()
 
+from pyairtable import Api
+from openai import AsyncOpenAI
+from nlp import (
+    extract_interests_with_relationships_async,
+    extract_interests_with_relationships_multi_async,
+    extract_interests_batch
+)
+from graph import update_knowledge_graph_batch
+import nlp_cache
+from rate_limit import AsyncTokenBucket
+
+# Per-record progress is logged at DEBUG so it costs nothing unless --log-level DEBUG is set
+logger = logging.getLogger(__name__)
+
 # Configuration
 AIRTABLE_API_KEY = os.environ.get("AIRTABLE_API_KEY")
 AIRTABLE_BASE_ID = os.environ.get("AIRTABLE_BASE_ID")
 
+# InfoText shorter than this (in words) never yields useful interests
+MIN_INFO_TEXT_WORDS = 8
+# InfoText made up only of greetings / filler words
+LOW_SIGNAL_PATTERN = re.compile(r"^[\s\W]*((hi|hello|hey|new|here|just|joined|excited|thanks)[\s\W]*)+$", re.IGNORECASE)
+
 def get_airtable_records(base_id, table_name, info_text_column="InfoText", name_column="Name", slack_id_column="Slack ID"):
     """
     Fetch all records from Airtable that have InfoText data.
@@ -43,30 +65,31 @@ def get_airtable_records(base_id, table_name, info_text_column="InfoText", name_
         api = Api(AIRTABLE_API_KEY)
         airtable_table = api.table(base_id, table_name)
         
-        # Get all records
-        all_records = airtable_table.all()
-        
-        # Filter records that have InfoText data
+        # Stream records page by page instead of buffering the whole table
+        total_records = 0
         records_with_info = []
-        for record in all_records:
-            fields = record.get("fields", {})
-            info_text = fields.get(info_text_column, "").strip()
+        for page in airtable_table.iterate(page_size=100):
+            total_records += len(page)
             
-            if info_text:  # Only include records with InfoText content
+            # Filter records that have InfoText data, keeping only the columns we use
+            for record in page:
+                fields = record.get("fields", {})
+                info_text = fields.get(info_text_column, "").strip()
+                if not info_text:
+                    continue
+                
                 # Use Slack ID if available, otherwise generate a unique ID from record ID
+                record_id = record["id"]
                 slack_id = fields.get(slack_id_column, "").strip()
-                user_id = slack_id if slack_id else f"airtable_{record['id']}"
-                
                 records_with_info.append({
-                    "record_id": record["id"],
-                    "user_id": user_id,  # For Neo4j (Slack ID or generated ID)
+                    "record_id": record_id,
+                    "user_id": slack_id or f"airtable_{record_id}",  # For Neo4j (Slack ID or generated ID)
                     "name": fields.get(name_column, "Unknown"),
                     "slack_id": slack_id,
-                    "info_text": info_text,
-                    "fields": fields  # Keep all fields for reference
+                    "info_text": info_text
                 })
         
-        print(f"✅ Found {len(all_records)} total records")
+        print(f"✅ Found {total_records} total records")
         print(f"✅ Found {len(records_with_info)} records with InfoText data")
         
         return records_with_info
@@ -75,62 +98,203 @@ def get_airtable_records(base_id, table_name, info_text_column="InfoText", name_
         print(f"❌ Error fetching from Airtable: {e}")
         return []
 
-def extract_interests_from_records(records, rate_limit_delay=1.0):
+def apply_cached_interests(records):
+    """
+    Fill in interest relationships from the NLP cache for records whose InfoText is unchanged.
+    
+    Args:
+        records (list): List of records with InfoText
+    
+    Returns:
+        list: Records that were not found in the cache and still need extraction
+    """
+    uncached_records = []
+    
+    for record in records:
+        record["info_text_hash"] = nlp_cache.text_hash(record["info_text"])
+        cached = nlp_cache.get(record["info_text_hash"])
+        if cached is not None:
+            record["interest_relationships"] = cached
+        else:
+            uncached_records.append(record)
+    
+    print(f"\n💾 NLP cache: {len(records) - len(uncached_records)} hits, {len(uncached_records)} misses")
+    return uncached_records
+
+def skip_low_signal_records(records, min_words=MIN_INFO_TEXT_WORDS):
+    """
+    Give records with too little InfoText an empty result without calling OpenAI.
+    
+    The empty result is not cached, so a later run with a lower min_words still
+    extracts these records (the check itself is cheap to repeat).
+    
+    Args:
+        records (list): List of records with InfoText
+        min_words (int): Minimum word count worth sending to OpenAI
+    
+    Returns:
+        list: Records that still need extraction
+    """
+    records_to_extract = []
+    
+    for record in records:
+        info_text = record["info_text"]
+        if len(info_text.split()) < min_words or LOW_SIGNAL_PATTERN.match(info_text):
+            record["interest_relationships"] = []
+        else:
+            records_to_extract.append(record)
+    
+    skipped = len(records) - len(records_to_extract)
+    if skipped:
+        print(f"⏩ Skipped {skipped} records with low-signal InfoText (< {min_words} words or greetings only)")
+    return records_to_extract
+
+def _cache_interests(record):
+    """Store a record's freshly extracted interests in the NLP cache."""
+    text_hash = record.get("info_text_hash") or nlp_cache.text_hash(record["info_text"])
+    nlp_cache.put(text_hash, record["interest_relationships"])
+
+async def _extract_interests_concurrently(texts, rate_limit_delay, max_concurrency, profiles_per_request=1):
+    """
+    Run interest extraction for all texts concurrently.
+    
+    Texts are packed profiles_per_request at a time into each OpenAI request.
+    Request starts are paced by a token bucket refilling one request every
+    rate_limit_delay seconds (bursting up to max_concurrency), so the delay is
+    a global rate budget rather than a serial wait after every call.
+    
+    Returns:
+        list: One entry per text - a list of (interest, relationship_type) tuples
+              or the Exception raised while extracting it
+    """
+    limiter = AsyncTokenBucket(1 / rate_limit_delay, capacity=max_concurrency) if rate_limit_delay > 0 else None
+    semaphore = asyncio.Semaphore(max_concurrency)
+    chunks = [texts[i:i + profiles_per_request] for i in range(0, len(texts), profiles_per_request)]
+    
+    async with AsyncOpenAI() as async_client:
+        async def extract_chunk(chunk):
+            async with semaphore:
+                if limiter:
+                    await limiter.acquire()
+                if len(chunk) == 1:
+                    return [await extract_interests_with_relationships_async(chunk[0], async_client)]
+                return await extract_interests_with_relationships_multi_async(chunk, async_client)
+        
+        chunk_results = await asyncio.gather(
+            *(extract_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+    
+    # Fan chunk results back out to one entry per text
+    results = []
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, Exception):
+            results.extend([chunk_result] * len(chunk))
+        else:
+            results.extend(chunk_result)
+    return results
+
+def extract_interests_from_records(records, rate_limit_delay=1.0, max_concurrency=8, profiles_per_request=1):
     """
     Extract professional interests with relationship types from InfoText for each record.
     
+    Requests are sent concurrently (bounded by max_concurrency) instead of one at a time.
+    
     Args:
         records (list): List of records with InfoText
-        rate_limit_delay (float): Delay between API calls to avoid rate limits
+        rate_limit_delay (float): Average seconds per API request in the rate budget (0 disables pacing)
+        max_concurrency (int): Maximum number of in-flight OpenAI requests
+        profiles_per_request (int): Number of InfoTexts packed into each OpenAI request
     
     Returns:
         list: Records with extracted interest-relationship pairs added
     """
     print(f"\n🧠 Extracting professional interests with relationship types from {len(records)} records...")
+    print(f"   Concurrency: {max_concurrency} | Rate budget: 1 request per {rate_limit_delay}s | Profiles per request: {profiles_per_request}")
+    
+    results = asyncio.run(_extract_interests_concurrently(
+        [record["info_text"] for record in records],
+        rate_limit_delay,
+        max_concurrency,
+        profiles_per_request
+    ))
     
     processed_records = []
+    # Per-record details are only built when DEBUG logging is on, and written in one go
+    verbose = logger.isEnabledFor(logging.DEBUG)
+    report = []
     
-    for i, record in enumerate(records, 1):
+    for i, (record, result) in enumerate(zip(records, results), 1):
         name = record["name"]
-        info_text = record["info_text"]
         
-        print(f"\n📝 Processing {i}/{len(records)}: {name}")
-        print(f"   InfoText preview: {info_text[:150]}...")
+        if verbose:
+            report.append(f"\n📝 Processed {i}/{len(records)}: {name}")
+            report.append(f"   InfoText preview: {record['info_text'][:150]}...")
         
-        try:
-            # Extract interests with relationship types using the enhanced nlp function
-            interest_relationships = extract_interests_with_relationships(info_text)
-            
-            # Add interest-relationship pairs to record
-            record["interest_relationships"] = interest_relationships
-            processed_records.append(record)
-            
-            # Display the results with relationship types
-            print(f"   ✅ Extracted {len(interest_relationships)} interest-relationship pairs:")
-            for interest, relationship in interest_relationships:
-                print(f"      • {interest} ({relationship})")
-            
-            # Rate limiting to avoid OpenAI API limits
-            if i < len(records):
-                print(f"   ⏳ Waiting {rate_limit_delay}s before next extraction...")
-                time.sleep(rate_limit_delay)
-                
-        except Exception as e:
-            print(f"   ❌ Error extracting interests for {name}: {e}")
+        if isinstance(result, Exception):
+            logger.warning("   ❌ Error extracting interests for %s: %s", name, result)
             # Still add the record but with empty interest relationships
             record["interest_relationships"] = []
             processed_records.append(record)
             continue
+        
+        # Add interest-relationship pairs to record
+        record["interest_relationships"] = result
+        processed_records.append(record)
+        _cache_interests(record)
+        
+        # Display the results with relationship types
+        if verbose:
+            report.append(f"   ✅ Extracted {len(result)} interest-relationship pairs:")
+            for interest, relationship in result:
+                report.append(f"      • {interest} ({relationship})")
+    
+    if report:
+        logger.debug("\n".join(report))
     
     print(f"\n✅ Interest extraction completed for {len(processed_records)} records")
     return processed_records
 
-def save_interests_to_neo4j(records):
+def extract_interests_from_records_batch(records):
+    """
+    Extract interests for all records in a single OpenAI Batch API job.
+    
+    Args:
+        records (list): List of records with InfoText
+    
+    Returns:
+        list: Records with extracted interest-relationship pairs added
+    """
+    print(f"\n🧠 Extracting professional interests for {len(records)} records via the OpenAI Batch API...")
+    
+    try:
+        results = extract_interests_batch({record["record_id"]: record["info_text"] for record in records})
+    except Exception as e:
+        print(f"❌ Batch extraction failed: {e}")
+        results = {}
+    
+    for record in records:
+        if record["record_id"] in results:
+            record["interest_relationships"] = results[record["record_id"]]
+            _cache_interests(record)
+        else:
+            record["interest_relationships"] = []
+        logger.debug("   ✅ %s: %d interest-relationship pairs", record["name"], len(record["interest_relationships"]))
+    
+    print(f"\n✅ Interest extraction completed for {len(records)} records")
+    return records
+
+def save_interests_to_neo4j(records, max_workers=8, users_per_batch=200):
     """
     Save extracted interests with relationship types to Neo4j knowledge graph.
     
+    Records are written in UNWIND batches of users_per_batch users, and
+    batches run concurrently on a bounded thread pool.
+    
     Args:
         records (list): Records with extracted interest-relationship pairs
+        max_workers (int): Maximum number of concurrent Neo4j batch writes
+        users_per_batch (int): Number of users written per Neo4j transaction batch
     
     Returns:
         int: Number of records successfully saved to Neo4j
@@ -140,34 +304,41 @@ def save_interests_to_neo4j(records):
     saved_count = 0
     current_timestamp = str(int(time.time()))  # Use current time as timestamp
     
+    records_to_save = []
     for i, record in enumerate(records, 1):
-        user_id = record["user_id"]
-        name = record["name"]
-        interest_relationships = record["interest_relationships"]
-        
-        if not interest_relationships:
-            print(f"   ⚠️  Skipping {i}/{len(records)}: {name} - No interests extracted")
+        if not record["interest_relationships"]:
+            logger.debug("   ⚠️  Skipping %d/%d: %s - No interests extracted", i, len(records), record["name"])
             continue
+        records_to_save.append(record)
+    
+    batches = [records_to_save[i:i + users_per_batch] for i in range(0, len(records_to_save), users_per_batch)]
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                update_knowledge_graph_batch,
+                [(r["user_id"], r["name"], r["interest_relationships"], current_timestamp) for r in batch]
+            ): batch
+            for batch in batches
+        }
         
-        try:
-            # Use the enhanced graph update function with relationship types
-            update_knowledge_graph_with_relationships(user_id, name, interest_relationships, current_timestamp)
-            
-            # Count relationships by type for display
-            relationship_counts = {}
-            for _, rel_type in interest_relationships:
-                relationship_counts[rel_type] = relationship_counts.get(rel_type, 0) + 1
-            
-            rel_summary = ", ".join([f"{count} {rel_type}" for rel_type, count in relationship_counts.items()])
-            print(f"   ✅ Saved {i}/{len(records)}: {name} -> Neo4j ({rel_summary})")
-            saved_count += 1
+        for future in as_completed(futures):
+            batch = futures[future]
             
-            # Small delay to avoid overwhelming Neo4j
-            time.sleep(0.1)
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning("   ❌ Failed to save batch of %d records to Neo4j: %s", len(batch), e)
+                continue
             
-        except Exception as e:
-            print(f"   ❌ Failed to save {name} to Neo4j: {e}")
-            continue
+            if logger.isEnabledFor(logging.DEBUG):
+                for record in batch:
+                    # Count relationships by type for display
+                    relationship_counts = Counter(rel_type for _, rel_type in record["interest_relationships"])
+                    
+                    rel_summary = ", ".join([f"{count} {rel_type}" for rel_type, count in relationship_counts.items()])
+                    logger.debug("   ✅ Saved %s -> Neo4j (%s)", record["name"], rel_summary)
+            saved_count += len(batch)
     
     print(f"\n✅ Successfully saved {saved_count}/{len(records)} records to Neo4j")
     return saved_count
@@ -179,73 +350,57 @@ def print_interest_summary(records):
     Args:
         records (list): Records with extracted interest-relationship pairs
     """
-    print(f"\n📊 PROFESSIONAL INTEREST & RELATIONSHIP EXTRACTION SUMMARY")
-    print("=" * 65)
+    # Build the whole summary and write it in one go
+    lines = []
+    
+    lines.append(f"\n📊 PROFESSIONAL INTEREST & RELATIONSHIP EXTRACTION SUMMARY")
+    lines.append("=" * 65)
     
-    # Count all interests by relationship type
+    # Single pass over records: overall counts, per-relationship counts and per-person breakdown
+    interest_count = Counter()
     relationship_data = {
-        "IS_EXPERT_IN": [],
-        "WORKING_ON": [],
-        "INTERESTED_IN": []
+        "IS_EXPERT_IN": Counter(),
+        "WORKING_ON": Counter(),
+        "INTERESTED_IN": Counter()
     }
-    
-    all_interests = []
+    per_person = []
     
     for record in records:
+        rel_summary = defaultdict(list)
         for interest, rel_type in record["interest_relationships"]:
-            all_interests.append(interest)
+            interest_count[interest] += 1
             if rel_type in relationship_data:
-                relationship_data[rel_type].append(interest)
-    
-    # Count frequency of each interest
-    interest_count = {}
-    for interest in all_interests:
-        interest_count[interest] = interest_count.get(interest, 0) + 1
-    
-    # Sort by frequency
-    sorted_interests = sorted(interest_count.items(), key=lambda x: x[1], reverse=True)
+                relationship_data[rel_type][interest] += 1
+            rel_summary[rel_type].append(interest)
+        if rel_summary:
+            per_person.append((record["name"], rel_summary))
     
-    print(f"Total interest connections: {len(all_interests)}")
-    print(f"Unique interests: {len(sorted_interests)}")
+    lines.append(f"Total interest connections: {sum(interest_count.values())}")
+    lines.append(f"Unique interests: {len(interest_count)}")
     
     # Show breakdown by relationship type
-    print(f"\nBreakdown by relationship type:")
-    for rel_type, interests in relationship_data.items():
-        unique_interests = len(set(interests))
-        total_connections = len(interests)
-        print(f"  {rel_type}: {total_connections} connections ({unique_interests} unique interests)")
+    lines.append(f"\nBreakdown by relationship type:")
+    for rel_type, rel_count in relationship_data.items():
+        lines.append(f"  {rel_type}: {sum(rel_count.values())} connections ({len(rel_count)} unique interests)")
     
-    print(f"\nTop interests overall (by frequency):")
-    for interest, count in sorted_interests[:15]:  # Show top 15
-        print(f"  {count:2d}x - {interest}")
+    lines.append(f"\nTop interests overall (by frequency):")
+    for interest, count in interest_count.most_common(15):  # Show top 15
+        lines.append(f"  {count:2d}x - {interest}")
     
     # Show top interests by relationship type
-    for rel_type, interests in relationship_data.items():
-        if interests:
-            rel_count = {}
-            for interest in interests:
-                rel_count[interest] = rel_count.get(interest, 0) + 1
-            
-            sorted_rel = sorted(rel_count.items(), key=lambda x: x[1], reverse=True)
-            print(f"\nTop {rel_type} interests:")
-            for interest, count in sorted_rel[:8]:  # Show top 8 for each type
-                print(f"  {count:2d}x - {interest}")
-    
-    print(f"\nPer-person breakdown:")
-    for record in records:
-        name = record["name"]
-        interest_relationships = record["interest_relationships"]
-        
-        if interest_relationships:
-            rel_summary = {}
-            for interest, rel_type in interest_relationships:
-                if rel_type not in rel_summary:
-                    rel_summary[rel_type] = []
-                rel_summary[rel_type].append(interest)
-            
-            print(f"  {name}:")
-            for rel_type, interests in rel_summary.items():
-                print(f"    {rel_type}: {interests}")
+    for rel_type, rel_count in relationship_data.items():
+        if rel_count:
+            lines.append(f"\nTop {rel_type} interests:")
+            for interest, count in rel_count.most_common(8):  # Show top 8 for each type
+                lines.append(f"  {count:2d}x - {interest}")
+    
+    lines.append(f"\nPer-person breakdown:")
+    for name, rel_summary in per_person:
+        lines.append(f"  {name}:")
+        for rel_type, interests in rel_summary.items():
+            lines.append(f"    {rel_type}: {interests}")
+    
+    print("\n".join(lines))
 
 def main():
     """
@@ -257,10 +412,18 @@ def main():
     parser.add_argument('--info-column', type=str, default='InfoText', help='InfoText column name (default: InfoText)')
     parser.add_argument('--name-column', type=str, default='Name', help='Name column name (default: Name)')
     parser.add_argument('--slack-id-column', type=str, default='Slack ID', help='Slack ID column name (default: Slack ID)')
-    parser.add_argument('--rate-limit', type=float, default=1.5, help='Rate limit delay in seconds (default: 1.5)')
+    parser.add_argument('--rate-limit', type=float, default=1.5, help='Average seconds per OpenAI request in the token-bucket rate budget (default: 1.5)')
+    parser.add_argument('--max-concurrency', type=int, default=8, help='Maximum concurrent OpenAI requests (default: 8)')
+    parser.add_argument('--profiles-per-request', type=int, default=10, help='InfoTexts packed into each OpenAI request (default: 10)')
+    parser.add_argument('--use-batch-api', action='store_true', help='Use the OpenAI Batch API (50%% cheaper, up to 24h turnaround)')
+    parser.add_argument('--min-words', type=int, default=MIN_INFO_TEXT_WORDS, help=f'Skip InfoText shorter than this many words (default: {MIN_INFO_TEXT_WORDS})')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore cached extractions and re-process every record')
+    parser.add_argument('--neo4j-workers', type=int, default=8, help='Concurrent Neo4j writes (default: 8)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Logging level; DEBUG shows per-record details (default: INFO)')
     parser.add_argument('--dry-run', action='store_true', help='Extract interests but do not save to Neo4j')
     
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s")
     
     print("🚀 AIRTABLE INTEREST EXTRACTOR -> NEO4J (Enhanced with Relationship Types)")
     print("=" * 75)
@@ -278,6 +441,10 @@ def main():
     print(f"  Name Column: {args.name_column}")
     print(f"  Slack ID Column: {args.slack_id_column}")
     print(f"  Rate Limit: {args.rate_limit}s")
+    print(f"  Max Concurrency: {args.max_concurrency}")
+    print(f"  Profiles Per Request: {args.profiles_per_request}")
+    print(f"  Batch API: {args.use_batch_api}")
+    print(f"  Use Cache: {not args.no_cache}")
     print(f"  Dry Run: {args.dry_run}")
     print(f"\n🔗 Relationship Types: IS_EXPERT_IN, WORKING_ON, INTERESTED_IN")
     print()
@@ -296,14 +463,27 @@ def main():
         return
     
     # Step 2: Extract interests with relationship types from InfoText
-    records_with_interests = extract_interests_from_records(records, args.rate_limit)
+    # Only records with new or changed InfoText are sent to OpenAI
+    uncached_records = records if args.no_cache else apply_cached_interests(records)
+    records_to_extract = skip_low_signal_records(uncached_records, args.min_words)
+    
+    if not records_to_extract:
+        if uncached_records:
+            print("✅ Remaining records served from cache or skipped as low-signal - no OpenAI calls needed")
+        else:
+            print("✅ All records served from cache - no OpenAI calls needed")
+    elif args.use_batch_api:
+        extract_interests_from_records_batch(records_to_extract)
+    else:
+        extract_interests_from_records(records_to_extract, args.rate_limit, args.max_concurrency, args.profiles_per_request)
+    records_with_interests = records
     
     # Step 3: Print detailed summary
     print_interest_summary(records_with_interests)
     
     # Step 4: Save to Neo4j (unless dry run)
     if not args.dry_run:
-        save_interests_to_neo4j(records_with_interests)
+        save_interests_to_neo4j(records_with_interests, args.neo4j_workers)
     else:
         print(f"\n⚠️  DRY RUN: Skipping Neo4j save")
     
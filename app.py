@@ -4,26 +4,137 @@ Only admins can trigger the bot using /trigger-survey command.
 """
 
 import os
+import re
+import ssl
+import logging
+import time
+import queue
 import threading
-from datetime import datetime
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+
+# Load .env before the project imports below - logging_setup and utils read
+# settings such as LOG_LEVEL, OPENAI_RPM and REDIS_URL at import time
+load_dotenv()
+
 from slack_bolt import App
+from slack_sdk import WebClient
+from logging_setup import logger
 from utils import (
-    is_admin, safe_get_conversation_state, safe_update_conversation_state,
-    get_openai_response, notify_users_in_table, conversation_state,
-    suggest_relevant_users, format_user_suggestions, should_suggest_users
+    is_admin, safe_start_conversation, safe_update_conversation_state,
+    get_openai_response, notify_users_in_table, count_active_conversations,
+    suggest_relevant_users, format_user_suggestions, should_suggest_users,
+    get_display_name, warm_display_name_cache, display_name_refresh_loop, update_user_cooldown,
+    RateLimitedSlackClient, clear_expired_cooldowns, clear_expired_conversations, CHANNEL_TAG_COOLDOWN,
+    ADMIN_USER_IDS, USER_TAG_COOLDOWN,
+    is_channel_in_cooldown, update_channel_cooldown
 )
-from nlp import extract_topics_with_relationships
-from graph import update_knowledge_graph
 
-load_dotenv()
+# nlp (OpenAI client) and graph (Neo4j driver) are imported on first use so
+# process start-up doesn't pay for them
+@functools.lru_cache(maxsize=None)
+def _get_nlp():
+    import nlp
+    return nlp
 
-# Slack Bolt app
+@functools.lru_cache(maxsize=None)
+def _get_graph():
+    import graph
+    return graph
+
+# Slack Bolt app. The WebClient shares one TLS context across calls - without it,
+# urllib builds a fresh context (and reloads the CA bundle) for every request.
+slack_ssl_context = ssl.create_default_context()
 app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
+    client=WebClient(token=os.environ.get("SLACK_BOT_TOKEN"), ssl=slack_ssl_context),
     signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
 )
 
+# All outbound Slack calls go through this throttled client (per-method token
+# buckets plus Retry-After handling on 429s)
+slack_client = RateLimitedSlackClient(app.client)
+
+# Channels never considered for topic extraction or tagging (comma-separated IDs)
+EXCLUDED_CHANNEL_IDS = frozenset(filter(None, os.environ.get("EXCLUDED_CHANNEL_IDS", "").split(",")))
+SKIPPED_CHANNEL_TYPES = ("im", "mpim")
+
+# Optional allowlist of channels where users may be tagged (empty = all processed channels)
+TAG_CHANNEL_IDS = frozenset(filter(None, os.environ.get("TAG_CHANNEL_IDS", "").split(",")))
+
+def can_tag_in_channel(channel: str) -> bool:
+    """Cheap guard checked before the o3-mini tagging decision."""
+    return not TAG_CHANNEL_IDS or channel in TAG_CHANNEL_IDS
+
+def should_process_channel(channel: str, channel_type: str) -> bool:
+    """Channel-only precheck: skip DMs (survey conversations) and excluded channels."""
+    return channel_type not in SKIPPED_CHANNEL_TYPES and channel not in EXCLUDED_CHANNEL_IDS
+
+# Cheap pre-filter for messages that can't yield topics (short replies, code, emoji, mentions)
+MIN_TOPIC_TEXT_LENGTH = 15
+SKIP_TEXT_PREFIXES = ("```", ":", "<@")
+EMOJI_ONLY_RE = re.compile(r"(?:\s|:[\w+'-]+:|[\u2600-\u27bf\U0001f000-\U0001faff\ufe0f\u200d])+")
+
+def is_low_signal_message(text: str) -> bool:
+    """Return True for messages not worth sending to topic extraction."""
+    stripped = text.strip()
+    return (
+        len(stripped) < MIN_TOPIC_TEXT_LENGTH
+        or stripped.startswith(SKIP_TEXT_PREFIXES)
+        or EMOJI_ONLY_RE.fullmatch(stripped) is not None
+    )
+
+# Shared pool for slow handler work (OpenAI, Airtable, Slack writes) so Bolt's
+# listener threads are released as soon as the request is acknowledged
+BACKGROUND_WORKER_COUNT = int(os.environ.get("BACKGROUND_WORKER_COUNT", 4))
+background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKER_COUNT, thread_name_prefix="background")
+
+def submit_background(func, *args):
+    """Run func(*args) on the background pool, logging any exception it raises."""
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            logger.exception(f"❌ BACKGROUND TASK FAILED: {func.__name__} - {e}")
+    
+    return background_executor.submit(run)
+
+# Dedicated pool for /trigger-survey runs. At most MAX_PENDING_SURVEYS runs may be
+# running or waiting; further triggers are rejected instead of piling up.
+SURVEY_WORKER_COUNT = int(os.environ.get("SURVEY_WORKER_COUNT", 2))
+MAX_PENDING_SURVEYS = SURVEY_WORKER_COUNT * 2
+survey_executor = ThreadPoolExecutor(max_workers=SURVEY_WORKER_COUNT, thread_name_prefix="survey")
+survey_slots = threading.BoundedSemaphore(MAX_PENDING_SURVEYS)
+
+# Progress updates posted while a survey run is sending DMs
+SURVEY_PROGRESS_EVERY = 25
+SURVEY_PROGRESS_INTERVAL = 5  # seconds
+MAX_SURVEY_PROGRESS_UPDATES = 3
+
+# Static /trigger-survey responses
+USAGE_TEXT = (
+    "📋 *MLAI Survey Bot - Usage*\n\n"
+    "`/trigger-survey <table_id> [test|all] [column_name]`\n\n"
+    "*Examples:*\n"
+    "• `/trigger-survey tbl123ABC456DEF test` - Send to first user only\n"
+    "• `/trigger-survey tbl123ABC456DEF all` - Send to all users\n"
+    "• `/trigger-survey tbl123ABC456DEF test UserSlackID` - Custom column name\n\n"
+)
+ACCESS_DENIED_RESPONSE = {
+    "response_type": "ephemeral",
+    "text": "❌ *Access Denied*\n\nOnly administrators can use this command."
+}
+INVALID_ARGUMENTS_RESPONSE = {
+    "response_type": "ephemeral",
+    "text": "❌ *Invalid arguments*\n\n"
+           "Usage: `/trigger-survey <table_id> [test|all] [column_name]`"
+}
+INVALID_MODE_RESPONSE = {
+    "response_type": "ephemeral",
+    "text": "❌ *Invalid mode*\n\nMode must be either `test` or `all`"
+}
+
 # Slash command handler
 @app.command("/trigger-survey")
 def handle_trigger_survey_command(ack, respond, command):
@@ -34,10 +145,7 @@ def handle_trigger_survey_command(ack, respond, command):
     
     # Check if user is admin
     if not is_admin(user_id):
-        respond({
-            "response_type": "ephemeral",
-            "text": "❌ *Access Denied*\n\nOnly administrators can use this command."
-        })
+        respond(ACCESS_DENIED_RESPONSE)
         return
     
     # Parse command arguments
@@ -46,13 +154,7 @@ def handle_trigger_survey_command(ack, respond, command):
     if not text:
         respond({
             "response_type": "ephemeral",
-            "text": "📋 *MLAI Survey Bot - Usage*\n\n"
-                   "`/trigger-survey <table_id> [test|all] [column_name]`\n\n"
-                   "*Examples:*\n"
-                   "• `/trigger-survey tbl123ABC456DEF test` - Send to first user only\n"
-                   "• `/trigger-survey tbl123ABC456DEF all` - Send to all users\n"
-                   "• `/trigger-survey tbl123ABC456DEF test UserSlackID` - Custom column name\n\n"
-                   f"*Current active conversations:* {len(conversation_state)}"
+            "text": f"{USAGE_TEXT}*Current active conversations:* {count_active_conversations()}"
         })
         return
     
@@ -60,11 +162,7 @@ def handle_trigger_survey_command(ack, respond, command):
     args = text.split()
     
     if len(args) < 2:
-        respond({
-            "response_type": "ephemeral",
-            "text": "❌ *Invalid arguments*\n\n"
-                   "Usage: `/trigger-survey <table_id> [test|all] [column_name]`"
-        })
+        respond(INVALID_ARGUMENTS_RESPONSE)
         return
     
     table_id = args[0]
@@ -72,77 +170,100 @@ def handle_trigger_survey_command(ack, respond, command):
     column_name = args[2] if len(args) > 2 else "SlackID"
     
     if mode not in ["test", "all"]:
-        respond({
-            "response_type": "ephemeral",
-            "text": "❌ *Invalid mode*\n\nMode must be either `test` or `all`"
-        })
+        respond(INVALID_MODE_RESPONSE)
         return
     
     test_mode = (mode == "test")
     
-    # Acknowledge the command
-    respond({
-        "response_type": "ephemeral",
-        "text": f"🚀 *Triggering Survey Bot*\n\n"
-               f"• Table ID: `{table_id}`\n"
-               f"• Mode: `{mode}`\n"
-               f"• Column: `{column_name}`\n\n"
-               f"_Processing in background..._"
-    })
-    
     # Run the operation in background
     def run_survey():
         try:
-            print(f"🔄 Starting background survey operation...")
-            print(f"   Table ID: {table_id}")
-            print(f"   Mode: {mode}")
-            print(f"   Column: {column_name}")
-            print(f"   Test mode: {test_mode}")
+            # Acknowledge the command from the background task so the handler returns immediately
+            respond({
+                "response_type": "ephemeral",
+                "text": f"🚀 *Triggering Survey Bot*\n\n"
+                       f"• Table ID: `{table_id}`\n"
+                       f"• Mode: `{mode}`\n"
+                       f"• Column: `{column_name}`\n\n"
+                       f"_Processing in background..._"
+            })
             
-            users_messaged = notify_users_in_table(app.client, table_id, column_name, test_mode)
-            print(f"✅ Background operation completed successfully. Users messaged: {users_messaged}")
+            logger.info(f"🔄 Starting background survey operation...")
+            logger.info(f"   Table ID: {table_id}")
+            logger.info(f"   Mode: {mode}")
+            logger.info(f"   Column: {column_name}")
+            logger.info(f"   Test mode: {test_mode}")
             
-            # Send completion message
-            print(f"🔄 Sending completion message to user {user_id} in channel {command['channel_id']}")
-            completion_result = app.client.chat_postEphemeral(
-                channel=command["channel_id"],
-                user=user_id,
-                text=f"✅ *Survey Bot Completed*\n\n"
-                     f"Successfully sent messages to **{users_messaged}** user(s) from table `{table_id}`\n\n"
-                     f"Mode: `{mode}` | Column: `{column_name}`"
-            )
-            print(f"✅ Completion message sent successfully: {completion_result.get('ok', 'Unknown')}")
+            # Stream results, posting a few progress updates (response_url allows 5 uses in total)
+            users_messaged = 0
+            progress_updates = 0
+            last_progress = time.monotonic()
+            for _ in notify_users_in_table(slack_client, table_id, column_name, test_mode):
+                users_messaged += 1
+                if (
+                    progress_updates < MAX_SURVEY_PROGRESS_UPDATES
+                    and (users_messaged % SURVEY_PROGRESS_EVERY == 0 or time.monotonic() - last_progress >= SURVEY_PROGRESS_INTERVAL)
+                ):
+                    respond({
+                        "response_type": "ephemeral",
+                        "replace_original": True,
+                        "text": f"📤 *Survey Bot in progress*\n\n"
+                                f"Sent messages to **{users_messaged}** user(s) from table `{table_id}` so far..."
+                    })
+                    progress_updates += 1
+                    last_progress = time.monotonic()
+            logger.info(f"✅ Background operation completed successfully. Users messaged: {users_messaged}")
+            
+            # Replace the "Triggering" ephemeral in place via the command's response_url
+            logger.info(f"🔄 Sending completion message to user {user_id} in channel {command['channel_id']}")
+            completion_result = respond({
+                "response_type": "ephemeral",
+                "replace_original": True,
+                "text": f"✅ *Survey Bot Completed*\n\n"
+                        f"Successfully sent messages to **{users_messaged}** user(s) from table `{table_id}`\n\n"
+                        f"Mode: `{mode}` | Column: `{column_name}`"
+            })
+            logger.info(f"✅ Completion message sent: HTTP {completion_result.status_code}")
             
         except Exception as e:
-            print(f"❌ ERROR in background survey operation:")
-            print(f"   Error type: {type(e).__name__}")
-            print(f"   Error message: {str(e)}")
+            logger.error(f"❌ ERROR in background survey operation:")
+            logger.error(f"   Error type: {type(e).__name__}")
+            logger.error(f"   Error message: {str(e)}")
             
-            # Print full traceback for debugging
-            import traceback
-            print(f"   Full traceback:")
-            traceback.print_exc()
+            # Log full traceback for debugging
+            logger.exception(f"   Full traceback:")
             
             try:
-                print(f"🔄 Attempting to send error message to user {user_id}")
-                error_result = app.client.chat_postEphemeral(
-                    channel=command["channel_id"],
-                    user=user_id,
-                    text=f"❌ *Survey Bot Error*\n\n"
-                         f"Error processing table `{table_id}`: {str(e)}\n\n"
-                         f"Check server logs for details."
-                )
-                print(f"✅ Error message sent successfully: {error_result.get('ok', 'Unknown')}")
+                logger.info(f"🔄 Attempting to send error message to user {user_id}")
+                error_result = respond({
+                    "response_type": "ephemeral",
+                    "replace_original": True,
+                    "text": f"❌ *Survey Bot Error*\n\n"
+                            f"Error processing table `{table_id}`: {str(e)}\n\n"
+                            f"Check server logs for details."
+                })
+                logger.info(f"✅ Error message sent: HTTP {error_result.status_code}")
             except Exception as error_send_exception:
-                print(f"❌ FAILED to send error message: {error_send_exception}")
-                print(f"   This might be why you're seeing dispatch_failed!")
+                logger.error(f"❌ FAILED to send error message: {error_send_exception}")
+                logger.error(f"   This might be why you're seeing dispatch_failed!")
+    
+    if not survey_slots.acquire(blocking=False):
+        logger.warning(f"⚠️ Survey pool busy - rejecting trigger from {user_id}")
+        respond({
+            "response_type": "ephemeral",
+            "text": "⏳ *Survey Bot is busy*\n\n"
+                   f"{MAX_PENDING_SURVEYS} survey runs are already in progress or queued. Please try again shortly."
+        })
+        return
     
-    # Start background thread
-    print(f"🚀 Starting background thread for survey operation...")
-    thread = threading.Thread(target=run_survey)
-    thread.daemon = True
-    thread.start()
-    print(f"✅ Background thread started successfully")
+    def run_survey_and_release():
+        try:
+            run_survey()
+        finally:
+            survey_slots.release()
+    
+    survey_executor.submit(run_survey_and_release)
+    logger.info(f"✅ Survey operation queued on survey pool")
 
 # Slack Bolt event handlers
 @app.action("start_survey_button")
@@ -154,206 +275,287 @@ def handle_survey_start_button(ack, body, client):
     channel_id = body["channel"]["id"]
     message_ts = body["message"]["ts"]
     
-    print(f"User {user_id} clicked the Start Survey button")
+    logger.info(f"User {user_id} clicked the Start Survey button")
     
-    # Get current state safely
-    state = safe_get_conversation_state(user_id)
-    
-    # Initialize conversation state with all required fields if not exists
-    if not state:
-        safe_update_conversation_state(user_id, {
-            "step": "not_started",
-            "conversation_history": [],
-            "start_time": None,
-            "thread_ts": message_ts
-        })
-        state = safe_get_conversation_state(user_id)
+    # Initialize the state, keep thread_ts from the original message and mark the survey
+    # started - one atomic read-modify-write, done here so repeat clicks see it at once
+    state, previous_step = safe_start_conversation(user_id, message_ts)
     
-    # Ensure thread_ts is maintained from original message
-    existing_thread_ts = state.get("thread_ts", message_ts)
-    safe_update_conversation_state(user_id, {"thread_ts": existing_thread_ts})
+    if previous_step == "started":
+        logger.info(f"⏩ SKIP: Survey already started for user {user_id} (duplicate click)")
+        return
     
+    # The first question needs an OpenAI round-trip - run it off the listener thread
+    submit_background(start_survey, slack_client, user_id, channel_id, message_ts, state)
+
+def survey_message_blocks(text: str) -> list:
+    """Single mrkdwn section used for every update of the survey invite message."""
+    return [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": text
+            }
+        }
+    ]
+
+# Static Block Kit payloads, built once instead of per click
+SURVEY_COMPLETED_BLOCKS = survey_message_blocks(
+    "✅ Thank you! Your survey responses have already been recorded.\n\nNo further input is needed."
+)
+SURVEY_STARTING_BLOCKS = survey_message_blocks("⏳ Starting your survey...")
+
+def start_survey(client, user_id, channel_id, message_ts, state):
+    """Replace the button message with the first question of a just-started survey."""
     # Check if already completed
     if state.get("step") == "completed":
         client.chat_update(
             channel=channel_id,
             ts=message_ts,
             text="Survey already completed!",
-            blocks=[
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": "✅ Thank you! Your survey responses have already been recorded.\n\nNo further input is needed."
-                    }
-                }
-            ]
+            blocks=SURVEY_COMPLETED_BLOCKS
         )
         return
     
-    # Start the survey and record timestamp
-    safe_update_conversation_state(user_id, {
-        "step": "started",
-        "start_time": datetime.now()
-    })
+    logger.info(f"🕐 Survey started for user {user_id} at {state['start_time']}")
     
-    updated_state = safe_get_conversation_state(user_id)
-    print(f"🕐 Survey started for user {user_id} at {updated_state['start_time']}")
-    
-    # Get first question from OpenAI with a neutral trigger (like working version)
-    response = get_openai_response(user_id, "Please ask the first question")
-    
-    # Update the original message with the first question
-    if response and response.strip():
-        question_text = response
-    else:
-        question_text = "Great! Let's start with the first question:\n\n**What motivated you to become a part of MLAI?**"
-    
-    # Replace the button message with the first question
-    client.chat_update(
-        channel=channel_id,
-        ts=message_ts,
-        text="Survey Started!",
-        blocks=[
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f"🚀 Survey Started!\n\n{question_text}"
-                }
-            }
-        ]
-    )
+    try:
+        # Replace the button straight away so the click gets feedback while OpenAI responds
+        client.chat_update(
+            channel=channel_id,
+            ts=message_ts,
+            text="Starting your survey...",
+            blocks=SURVEY_STARTING_BLOCKS
+        )
+        
+        # Get first question from OpenAI with a neutral trigger (like working version),
+        # showing the question in the placeholder while it streams in
+        def show_partial(text):
+            client.chat_update(
+                channel=channel_id,
+                ts=message_ts,
+                text="Survey Started!",
+                blocks=survey_message_blocks(f"🚀 Survey Started!\n\n{text}…")
+            )
+        
+        response = get_openai_response(user_id, "Please ask the first question", on_partial=show_partial)
+        
+        # Update the original message with the first question
+        if response and response.strip():
+            question_text = response
+        else:
+            question_text = "Great! Let's start with the first question:\n\n**What motivated you to become a part of MLAI?**"
+        
+        # Replace the placeholder with the first question
+        client.chat_update(
+            channel=channel_id,
+            ts=message_ts,
+            text="Survey Started!",
+            blocks=survey_message_blocks(f"🚀 Survey Started!\n\n{question_text}")
+        )
+    except Exception:
+        # Reset the step so the user can click the button again instead of every
+        # later click being dropped as a duplicate of this failed start
+        safe_update_conversation_state(user_id, {"step": "not_started", "start_time": None, "start_time_ns": None})
+        logger.error(f"❌ Survey start failed for user {user_id} - reset so the button can be retried")
+        raise
 
 # App mention handler removed - bot no longer responds to channel mentions
 
+# Background message processing - the Slack handler only filters and enqueues,
+# topic extraction / Neo4j / tagging run on worker threads
+MESSAGE_WORKER_COUNT = int(os.environ.get("MESSAGE_WORKER_COUNT", 4))
+message_queue = queue.Queue()
+# Per-message lookups get their own pool (one slot per message worker) so survey work
+# on the background pool can never hold up channel message processing
+lookup_executor = ThreadPoolExecutor(max_workers=MESSAGE_WORKER_COUNT, thread_name_prefix="lookup")
+
+def message_worker():
+    """Consume queued message events and run the full tagging pipeline."""
+    while True:
+        user_id, text, ts, channel, client, start_time = message_queue.get()
+        try:
+            process_message(user_id, text, ts, channel, client, start_time)
+        except Exception as e:
+            logger.exception(f"❌ MESSAGE WORKER FAILED: {e}")
+        finally:
+            message_queue.task_done()
+
+for _ in range(MESSAGE_WORKER_COUNT):
+    threading.Thread(target=message_worker, daemon=True).start()
+
+# Cooldown cleanup runs on its own thread so it never adds latency to message events
+COOLDOWN_CLEANUP_INTERVAL = 60
+
+def cooldown_cleanup_loop():
+    """Clear expired user cooldowns and conversation states every COOLDOWN_CLEANUP_INTERVAL seconds."""
+    stop = threading.Event()
+    while not stop.wait(COOLDOWN_CLEANUP_INTERVAL):
+        try:
+            clear_expired_cooldowns()
+            clear_expired_conversations()
+        except Exception as e:
+            logger.error(f"❌ COOLDOWN CLEANUP FAILED: {e}")
+
+# Slack redelivers events whose ack was slow - remember recently seen messages so a
+# redelivery doesn't run topic extraction and tagging a second time
+SEEN_EVENT_CACHE_SIZE = 2048
+seen_events = OrderedDict()
+seen_events_lock = threading.Lock()
+
+def is_duplicate_event(key) -> bool:
+    """Record an event key, returning True if it was already seen recently."""
+    with seen_events_lock:
+        if key in seen_events:
+            return True
+        seen_events[key] = None
+        if len(seen_events) > SEEN_EVENT_CACHE_SIZE:
+            seen_events.popitem(last=False)
+        return False
+
 # Enhanced message handler with comprehensive logging
 @app.event("message")
-def process_message_with_tagging(event, client, logger):
-    """Process message events with topic extraction and smart tagging."""
-    import time
-    import random
-    start_time = time.time()
+def process_message_with_tagging(event, client, request):
+    """Filter message events and queue candidates for topic extraction and smart tagging."""
+    start_time = time.monotonic()
     
-    # Periodic cooldown cleanup (1% chance per message)
-    if random.random() < 0.01:
-        from utils import clear_expired_cooldowns
-        clear_expired_cooldowns()
+    # Unpack the event once
+    user_id, text, ts, channel, channel_type, subtype, thread_ts, bot_id = (
+        event.get(key) for key in ("user", "text", "ts", "channel", "channel_type", "subtype", "thread_ts", "bot_id")
+    )
+    
+    # Bot echoes and events without an author or text are the most common noise -
+    # drop them before building any log lines (lazy %-args only format at DEBUG)
+    if bot_id or subtype == "bot_message" or not user_id or not text:
+        logger.debug("⏩ SKIP: Bot message or missing fields (bot_id=%s, user_id=%s, text=%s)", bot_id, bool(user_id), bool(text))
+        return
     
     # Basic event logging
-    print(f"📨 MESSAGE EVENT | {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"   Type: {event.get('type')} | Subtype: {event.get('subtype')}")
-    print(f"   User: {event.get('user')} | Channel: {event.get('channel')}")
-    print(f"   Text Preview: {event.get('text', '')[:80]}...")
+    logger.info(f"📨 MESSAGE EVENT | {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info(f"   Type: {event.get('type')} | Subtype: {subtype}")
+    logger.info(f"   User: {user_id} | Channel: {channel}")
+    logger.info(f"   Text Preview: {text[:80]}...")
+    
+    retry_num = request.headers.get("x-slack-retry-num")
+    if retry_num:
+        retry_reason = request.headers.get("x-slack-retry-reason", ["unknown"])
+        logger.info(f"🔁 RETRY: Slack redelivery #{retry_num[0]} (reason: {retry_reason[0]})")
     
     # Early exit conditions - check threads first to save AI credits
-    if event.get("thread_ts"):
-        print(f"⏩ SKIP: Threaded reply (thread_ts={event.get('thread_ts')}) - only processing original messages")
+    if thread_ts:
+        logger.info(f"⏩ SKIP: Threaded reply (thread_ts={thread_ts}) - only processing original messages")
         return
     
-    if event.get("bot_id"):
-        print(f"⏩ SKIP: Bot message (bot_id={event.get('bot_id')})")
+    if subtype in ('message_changed', 'message_deleted'):
+        logger.info(f"⏩ SKIP: Message subtype '{subtype}' - not processing")
         return
-
-    # Extract event data
-    user_id = event.get("user")
-    text = event.get("text")
-    ts = event.get("ts")
-    channel = event.get("channel")
-    subtype = event.get("subtype")
     
-    if not user_id or not text:
-        print(f"⏩ SKIP: Missing required fields (user_id={bool(user_id)}, text={bool(text)})")
+    if not should_process_channel(channel, channel_type):
+        logger.info(f"⏩ SKIP: Channel {channel} ({channel_type}) is excluded from tagging")
         return
     
-    if subtype and subtype in ['message_changed', 'message_deleted']:
-        print(f"⏩ SKIP: Message subtype '{subtype}' - not processing")
+    if is_low_signal_message(text):
+        logger.info(f"⏩ SKIP: Low-signal message (short, code, emoji or mention) - not extracting topics")
         return
+    
+    if is_duplicate_event((channel, ts)):
+        logger.info(f"⏩ SKIP: Duplicate delivery of message {ts} in {channel}")
+        return
+    
+    message_queue.put_nowait((user_id, text, ts, channel, slack_client, start_time))
+    logger.info(f"📥 QUEUED: Message from {user_id} ({message_queue.qsize()} waiting)")
 
-    print(f"🔄 PROCESSING: Message from {user_id} in {channel}")
+def process_message(user_id, text, ts, channel, client, start_time):
+    """Run topic extraction, Neo4j update and smart tagging for a queued message."""
 
-    # Get user display name with timing
-    display_name = "unknown"
-    try:
-        user_lookup_start = time.time()
-        user_info = client.users_info(user=user_id)
-        display_name = user_info["user"].get("profile", {}).get("display_name") or user_info["user"].get("real_name", "unknown")
-        user_lookup_time = time.time() - user_lookup_start
-        print(f"👤 USER LOOKUP: {user_id} = '{display_name}' ({user_lookup_time:.2f}s)")
-    except Exception as e:
-        print(f"❌ USER LOOKUP FAILED: {user_id} - {e}")
+    logger.info(f"🔄 PROCESSING: Message from {user_id} in {channel}")
 
-    # Topic extraction with timing and detailed logging
+    # Stage timings are only collected when DEBUG logging is enabled
+    timings = [] if logger.isEnabledFor(logging.DEBUG) else None
+    
+    def checkpoint(label):
+        if timings is not None:
+            timings.append((label, time.monotonic()))
+    
+    checkpoint("queue wait")
+
+    # Start the display name lookup now so it overlaps with topic extraction
+    display_name_future = lookup_executor.submit(get_display_name, client, user_id)
+
+    # Topic extraction with detailed logging
     topics = []
     topic_relationships = []
     try:
-        extraction_start = time.time()
-        topic_relationships = extract_topics_with_relationships(text)
+        topic_relationships = _get_nlp().extract_topics_cached(text)
         topics = [topic for topic, relationship in topic_relationships]
-        extraction_time = time.time() - extraction_start
         
-        print(f"🧠 TOPIC EXTRACTION: SUCCESS ({extraction_time:.2f}s)")
-        print(f"   Relationships: {topic_relationships}")
-        print(f"   Topics: {topics}")
-        
-        # Log topic extraction metrics
-        if topic_relationships:
-            relationship_counts = {}
-            for _, relationship in topic_relationships:
-                relationship_counts[relationship] = relationship_counts.get(relationship, 0) + 1
-            print(f"   Relationship distribution: {relationship_counts}")
+        logger.info(f"🧠 TOPIC EXTRACTION: SUCCESS")
+        logger.info(f"   Relationships: {topic_relationships}")
+        logger.info(f"   Topics: {topics}")
         
     except Exception as e:
-        extraction_time = time.time() - extraction_start
-        print(f"❌ TOPIC EXTRACTION FAILED: {user_id} - {e} ({extraction_time:.2f}s)")
+        logger.error(f"❌ TOPIC EXTRACTION FAILED: {user_id} - {e}")
+    checkpoint("extraction")
 
-    # Neo4j update with timing
+    # Collect the display name - usually finished by the time extraction returns
+    display_name = "unknown"
+    try:
+        display_name = display_name_future.result()
+        logger.info(f"👤 USER LOOKUP: {user_id} = '{display_name}'")
+    except Exception as e:
+        logger.error(f"❌ USER LOOKUP FAILED: {user_id} - {e}")
+    checkpoint("user lookup wait")
+
+    # Neo4j update - queued for the background batch writer
     neo4j_updated = False
     if topics:
-        try:
-            neo4j_start = time.time()
-            update_knowledge_graph(user_id, display_name, topics, ts)
-            neo4j_time = time.time() - neo4j_start
-            neo4j_updated = True
-            print(f"📊 NEO4J UPDATE: SUCCESS for {user_id} with {len(topics)} topics ({neo4j_time:.2f}s)")
-        except Exception as e:
-            neo4j_time = time.time() - neo4j_start
-            print(f"❌ NEO4J UPDATE FAILED: {user_id} - {e} ({neo4j_time:.2f}s)")
+        neo4j_updated = _get_graph().queue_knowledge_graph_update(user_id, display_name, topics, ts)
+        if neo4j_updated:
+            logger.info(f"📊 NEO4J UPDATE: Queued for {user_id} with {len(topics)} topics")
     else:
-        print(f"⏩ NEO4J: Skip - no topics extracted")
+        logger.info(f"⏩ NEO4J: Skip - no topics extracted")
 
     # Smart tagging with comprehensive logging
     tagging_attempted = False
     tagging_successful = False
     suggested_users_count = 0
     
-    if topics and should_suggest_users(channel, topics):
+    channel_in_cooldown = is_channel_in_cooldown(channel)
+    should_suggest = False
+    channel_taggable = can_tag_in_channel(channel)
+    if topics and channel_taggable and not channel_in_cooldown:
+        should_suggest = should_suggest_users(channel, topics)
+        checkpoint("tagging decision")
+    
+    if should_suggest:
         tagging_attempted = True
         try:
-            tagging_start = time.time()
-            print(f"🏷️ TAGGING: Starting suggestion process for topics: {topics}")
+            logger.info(f"🏷️ TAGGING: Starting suggestion process for topics: {topics}")
             
-            # Find relevant users
+            # Find relevant users - topic expansion and the Neo4j query only run once the
+            # decision is "yes", so declined messages don't pay for them
             suggestions = suggest_relevant_users(topics, exclude_user_id=user_id, channel_id=channel)
+            checkpoint("user matching")
             
             if suggestions:
                 suggested_users_count = len(suggestions['users'])
-                print(f"🔍 USER MATCHING: Found {suggested_users_count} relevant users")
+                logger.info(f"🔍 USER MATCHING: Found {suggested_users_count} relevant users")
                 
                 # Log user details
-                for i, user in enumerate(suggestions['users']):
-                    print(f"   {i+1}. {user['name']} ({user['user_id']}) - {user['best_relationship']} in {user['topics']}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    for i, user in enumerate(suggestions['users']):
+                        logger.debug(f"   {i+1}. {user['name']} ({user['user_id']}) - {user['best_relationship']} in {user['topics']}")
                 
                 # Generate warm response
-                llm_start = time.time()
                 suggestion_message = format_user_suggestions(suggestions, original_message=text)
-                llm_time = time.time() - llm_start
+                checkpoint("response generation")
                 
                 if suggestion_message:
-                    print(f"🎭 LLM RESPONSE: Generated warm message ({llm_time:.2f}s)")
-                    print(f"   Message: {suggestion_message}")
+                    logger.info(f"🎭 LLM RESPONSE: Generated warm message")
+                    logger.info(f"   Message: {suggestion_message}")
                     
-                    # Send to Slack
+                    # Send to Slack (client is the rate-limited wrapper)
                     slack_start = time.time()
                     response = client.chat_postMessage(
                         channel=channel,
@@ -366,103 +568,118 @@ def process_message_with_tagging(event, client, logger):
                     
                     if response.get("ok"):
                         tagging_successful = True
-                        print(f"✅ SLACK POST: Warm tagging response sent ({slack_time:.2f}s)")
-                        print(f"   Message TS: {response.get('ts')}")
+                        update_channel_cooldown(channel)
+                        logger.info(f"✅ SLACK POST: Warm tagging response sent ({slack_time:.2f}s)")
+                        logger.info(f"   Message TS: {response.get('ts')}")
                         
                         # Update cooldown for all tagged users
-                        from utils import update_user_cooldown
                         tagged_users = []
                         for user in suggestions['users']:
-                            user_id = user['user_id']
-                            if f"<@{user_id}>" in suggestion_message:
-                                update_user_cooldown(user_id)
+                            if f"<@{user['user_id']}>" in suggestion_message:
+                                update_user_cooldown(user['user_id'])
                                 tagged_users.append(user['name'])
                         
                         if tagged_users:
-                            print(f"⏱️ COOLDOWN: Updated for {len(tagged_users)} users: {', '.join(tagged_users)}")
+                            logger.info(f"⏱️ COOLDOWN: Updated for {len(tagged_users)} users: {', '.join(tagged_users)}")
                         else:
-                            print(f"⚠️ COOLDOWN: No users found in message - may be malformed")
+                            logger.warning(f"⚠️ COOLDOWN: No users found in message - may be malformed")
                     else:
-                        print(f"❌ SLACK POST FAILED: {response}")
+                        logger.error(f"❌ SLACK POST FAILED: {response}")
                 else:
-                    print(f"❌ LLM RESPONSE: Failed to generate message ({llm_time:.2f}s)")
+                    logger.error(f"❌ LLM RESPONSE: Failed to generate message")
             else:
-                print(f"⚠️ USER MATCHING: No relevant users found for topics: {topics}")
+                logger.warning(f"⚠️ USER MATCHING: No relevant users found for topics: {topics}")
                 
-            tagging_time = time.time() - tagging_start
-            print(f"🏷️ TAGGING: Process completed ({tagging_time:.2f}s)")
+            logger.info(f"🏷️ TAGGING: Process completed")
             
         except Exception as e:
-            tagging_time = time.time() - tagging_start
-            print(f"❌ TAGGING FAILED: {e} ({tagging_time:.2f}s)")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ TAGGING FAILED: {e}")
     else:
         # Log why tagging was skipped
         if not topics:
-            print(f"⏩ TAGGING: Skip - no topics extracted")
+            logger.info(f"⏩ TAGGING: Skip - no topics extracted")
+        elif not channel_taggable:
+            logger.info(f"⏩ TAGGING: Skip - channel {channel} is not in TAG_CHANNEL_IDS")
+        elif channel_in_cooldown:
+            logger.info(f"⏩ TAGGING: Skip - channel {channel} tagged within the last {CHANNEL_TAG_COOLDOWN // 60}m")
         else:
-            should_suggest = should_suggest_users(channel, topics)
-            print(f"⏩ TAGGING: Skip - should_suggest={should_suggest} for topics={topics}")
+            logger.info(f"⏩ TAGGING: Skip - should_suggest={should_suggest} for topics={topics}")
 
     # Final processing summary
-    total_time = time.time() - start_time
-    print(f"📋 PROCESSING SUMMARY:")
-    print(f"   Total time: {total_time:.2f}s")
-    print(f"   Topics extracted: {len(topics)}")
-    print(f"   Neo4j updated: {neo4j_updated}")
-    print(f"   Tagging attempted: {tagging_attempted}")
-    print(f"   Tagging successful: {tagging_successful}")
-    print(f"   Users suggested: {suggested_users_count}")
-    print(f"   Channel: {channel} | User: {display_name} ({user_id})")
-    print("─" * 80)
+    logger.info(f"📋 PROCESSING SUMMARY:")
+    logger.info(f"   Topics extracted: {len(topics)}")
+    logger.info(f"   Neo4j update queued: {neo4j_updated}")
+    logger.info(f"   Tagging attempted: {tagging_attempted}")
+    logger.info(f"   Tagging successful: {tagging_successful}")
+    logger.info(f"   Users suggested: {suggested_users_count}")
+    logger.info(f"   Channel: {channel} | User: {display_name} ({user_id})")
+    if timings is not None:
+        stages = []
+        previous = start_time
+        for label, at in timings:
+            stages.append(f"{label} {at - previous:.2f}s")
+            previous = at
+        logger.debug(f"⏱️ TIMING: {' | '.join(stages)} | total {time.monotonic() - start_time:.2f}s")
+    logger.info("─" * 80)
 
 if __name__ == "__main__":
-    from utils import ADMIN_USER_IDS, USER_TAG_COOLDOWN, CHANNEL_TAG_COOLDOWN
-    import time
-    
-    print("🤖 Starting MLAI Survey Bot with Enhanced Tagging System...")
-    print(f"   Version: Production with comprehensive logging")
-    print(f"   Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    print("")
-    print("📋 Configuration:")
-    print(f"   Admin Users: {ADMIN_USER_IDS}")
-    print(f"   Active Conversations: {len(conversation_state)}")
-    print(f"   User Tag Cooldown: {USER_TAG_COOLDOWN // 3600}h ({USER_TAG_COOLDOWN}s)")
-    print(f"   Channel Tag Cooldown: {CHANNEL_TAG_COOLDOWN // 60}m ({CHANNEL_TAG_COOLDOWN}s)")
-    print("")
-    print("🏷️ Smart Tagging Features:")
-    print("   ✅ Topic extraction with relationships (MENTIONS, WORKING_ON, INTERESTED_IN)")
-    print("   ✅ Neo4j knowledge graph integration")
-    print("   ✅ Intelligent user matching with priority ranking")
-    print("   ✅ o3-mini model for creative personality responses")
-    print("   ✅ Anti-spam filtering and rate limiting")
-    print("   ✅ User cooldown system with 1-hour protection")
-    print("   ✅ Comprehensive performance logging")
-    print("")
-    print("⏱️ Cooldown System:")
-    print(f"   🔒 Users cannot be tagged more than once per {USER_TAG_COOLDOWN // 3600} hour(s)")
-    print(f"   🧹 Automatic cleanup of expired cooldowns")
-    print(f"   📊 Thread-safe tracking with detailed logging")
-    print("")
-    print("💡 Slash Commands:")
-    print("   /trigger-survey <table_id> [test|all] [column_name]")
-    print("   🔒 Only admins can use slash commands")
-    print("")
-    print("📊 Logging Format:")
-    print("   📨 MESSAGE EVENT - Basic message processing")
-    print("   🧠 TOPIC EXTRACTION - OpenAI analysis with timing")
-    print("   📊 GRAPH QUERY - Neo4j user matching with details")
-    print("   🔍 USER SUGGESTION - Matching and filtering logic")
-    print("   🎭 LLM FORMATTING - Warm response generation")
-    print("   ✅ SLACK POST - Final delivery confirmation")
-    print("   📋 PROCESSING SUMMARY - End-to-end metrics")
-    print("")
+    
+    logger.info("🤖 Starting MLAI Survey Bot with Enhanced Tagging System...")
+    logger.info(f"   Version: Production with comprehensive logging")
+    logger.info(f"   Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("")
+    logger.info("📋 Configuration:")
+    logger.info(f"   Admin Users: {len(ADMIN_USER_IDS)} ({', '.join(sorted(ADMIN_USER_IDS)) or 'none configured'})")
+    logger.info(f"   Active Conversations: {count_active_conversations()}")
+    logger.info(f"   Message Workers: {MESSAGE_WORKER_COUNT}")
+    logger.info(f"   Survey Workers: {SURVEY_WORKER_COUNT} (max {MAX_PENDING_SURVEYS} pending)")
+    logger.info(f"   User Tag Cooldown: {USER_TAG_COOLDOWN // 3600}h ({USER_TAG_COOLDOWN}s)")
+    logger.info(f"   Channel Tag Cooldown: {CHANNEL_TAG_COOLDOWN // 60}m ({CHANNEL_TAG_COOLDOWN}s)")
+    logger.info("")
+    logger.info("🏷️ Smart Tagging Features:")
+    logger.info("   ✅ Topic extraction with relationships (MENTIONS, WORKING_ON, INTERESTED_IN)")
+    logger.info("   ✅ Neo4j knowledge graph integration")
+    logger.info("   ✅ Intelligent user matching with priority ranking")
+    logger.info("   ✅ o3-mini model for creative personality responses")
+    logger.info("   ✅ Anti-spam filtering and rate limiting")
+    logger.info("   ✅ User cooldown system with 1-hour protection")
+    logger.info("   ✅ Comprehensive performance logging")
+    logger.info("")
+    logger.info("⏱️ Cooldown System:")
+    logger.info(f"   🔒 Users cannot be tagged more than once per {USER_TAG_COOLDOWN // 3600} hour(s)")
+    logger.info(f"   🧹 Automatic cleanup of expired cooldowns")
+    logger.info(f"   📊 Thread-safe tracking with detailed logging")
+    logger.info("")
+    logger.info("💡 Slash Commands:")
+    logger.info("   /trigger-survey <table_id> [test|all] [column_name]")
+    logger.info("   🔒 Only admins can use slash commands")
+    logger.info("")
+    logger.info("📊 Logging Format:")
+    logger.info("   📨 MESSAGE EVENT - Basic message processing")
+    logger.info("   🧠 TOPIC EXTRACTION - OpenAI analysis with timing")
+    logger.info("   📊 GRAPH QUERY - Neo4j user matching with details")
+    logger.info("   🔍 USER SUGGESTION - Matching and filtering logic")
+    logger.info("   🎭 LLM FORMATTING - Warm response generation")
+    logger.info("   ✅ SLACK POST - Final delivery confirmation")
+    logger.info("   📋 PROCESSING SUMMARY - End-to-end metrics")
+    logger.info("")
+    
+    # Periodic cleanup of expired cooldowns
+    threading.Thread(target=cooldown_cleanup_loop, daemon=True).start()
+    
+    # Pre-resolve display names so message events skip users.info, and keep the directory fresh
+    warm_display_name_cache(slack_client)
+    threading.Thread(target=display_name_refresh_loop, args=(slack_client,), daemon=True).start()
+    
+    # Load nlp/graph in the background so the server starts listening immediately
+    # and the first message event doesn't pay the import cost either
+    submit_background(_get_nlp)
+    submit_background(_get_graph)
     
     # Ensure we're using port 3000
     port = int(os.environ.get("PORT", 3000))
-    print(f"🚀 Starting server on port {port}")
-    print("=" * 80)
+    logger.info(f"🚀 Starting server on port {port}")
+    logger.info("=" * 80)
     
     # Start Slack Bolt app
     app.start(port=port) 
\ No newline at end of file
@@ -1,30 +1,114 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, READ_ACCESS
+from collections import Counter, defaultdict
 import os
+import time
+import atexit
+import queue
+import logging
+import threading
+
+# Child of the bot's "mlai" logger, so standalone scripts don't pull in logging_setup
+logger = logging.getLogger("mlai.graph")
 
 # Neo4j connection setup from environment variables
 NEO4J_URI = os.environ.get("NEO4J_URI")
 NEO4J_USER = os.environ.get("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD")
 
-# Lazy loading for Neo4j driver
+# Connection pool shared by the message workers, batch writer and survey pool
+NEO4J_MAX_POOL_SIZE = 50
+NEO4J_ACQUISITION_TIMEOUT = 10  # seconds to wait for a free connection before failing
+
+# Supported relationship types and the context stored on each relationship
+RELATIONSHIP_CONTEXTS = {
+    "MENTIONS": "conversation",
+    "INTERESTED_IN": "learning_goal", 
+    "WORKING_ON": "active_project",
+    "IS_EXPERT_IN": "professional_expertise"
+}
+
+# UNWIND MERGE query per relationship type, built once so every write sends identical
+# query text and Neo4j reuses its cached plan (the relationship type can't be a parameter)
+MERGE_RELATIONSHIP_QUERIES = {
+    relationship_type: f"""
+        UNWIND $rows AS row
+        MERGE (u:User {{id: row.user_id}})
+        SET u.name = row.display_name
+        MERGE (t:Topic {{name: row.topic}})
+        MERGE (u)-[r:{relationship_type}]->(t)
+        ON CREATE SET r.count = 1, r.firstMentioned = row.ts, r.lastMentioned = row.ts, r.context = $context
+        ON MATCH SET r.count = r.count + 1, r.lastMentioned = row.ts
+    """
+    for relationship_type in RELATIONSHIP_CONTEXTS
+}
+
+# Background batching for per-message graph writes: flush every N updates or T seconds
+GRAPH_WRITE_BATCH_SIZE = 64
+GRAPH_WRITE_FLUSH_INTERVAL = 0.2  # seconds
+graph_write_queue = queue.Queue(maxsize=10000)
+_graph_writer_thread = None
+_graph_writer_lock = threading.Lock()
+
+# Unique constraints (each backed by an index) so MERGE on users/topics is an index lookup
+SCHEMA_CONSTRAINTS = (
+    "CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT topic_name IF NOT EXISTS FOR (t:Topic) REQUIRE t.name IS UNIQUE"
+)
+
+# Lazy loading for Neo4j driver - the lock keeps concurrent first callers
+# from each building a driver and re-running the schema setup
 _driver = None
+_driver_lock = threading.Lock()
+
+def ensure_schema(driver):
+    """Create the supporting constraints if they don't exist yet (idempotent)."""
+    try:
+        with driver.session() as session:
+            for statement in SCHEMA_CONSTRAINTS:
+                session.run(statement).consume()
+        logger.info("🗂️ Neo4j constraints ready (User.id, Topic.name)")
+    except Exception as e:
+        # Duplicate existing data or a read-only user shouldn't stop the bot - MERGE still works, just slower
+        logger.warning(f"⚠️ Could not create Neo4j constraints: {e}")
 
 def get_driver():
     """Get Neo4j driver with lazy loading."""
     global _driver
     if _driver is None:
-        if not NEO4J_URI:
-            raise ValueError("NEO4J_URI environment variable is not set")
-        if not NEO4J_PASSWORD:
-            raise ValueError("NEO4J_PASSWORD environment variable is not set")
-        
-        print(f"🔌 Connecting to Neo4j at {NEO4J_URI}")
-        _driver = GraphDatabase.driver(
-            NEO4J_URI,
-            auth=(NEO4J_USER, NEO4J_PASSWORD)
-        )
+        with _driver_lock:
+            if _driver is None:
+                if not NEO4J_URI:
+                    raise ValueError("NEO4J_URI environment variable is not set")
+                if not NEO4J_PASSWORD:
+                    raise ValueError("NEO4J_PASSWORD environment variable is not set")
+                
+                logger.info(f"🔌 Connecting to Neo4j at {NEO4J_URI}")
+                driver = GraphDatabase.driver(
+                    NEO4J_URI,
+                    auth=(NEO4J_USER, NEO4J_PASSWORD),
+                    max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+                    connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT
+                )
+                ensure_schema(driver)
+                _driver = driver
     return _driver
 
+def run_read_query(query, **params):
+    """
+    Run a read-only query in a managed read transaction.
+    
+    Read sessions can be routed to cluster followers, and execute_read retries
+    transient errors.
+    
+    Returns:
+        list: One dict per record (built by the driver's Result.data())
+    """
+    def read(tx):
+        return tx.run(query, **params).data()
+    
+    with get_driver().session(default_access_mode=READ_ACCESS) as session:
+        return session.execute_read(read)
+
 def update_knowledge_graph_with_relationships(user_id, display_name, topic_relationships, timestamp):
     """
     Enhanced version that creates different relationship types.
@@ -40,42 +124,112 @@ def update_knowledge_graph_with_relationships(user_id, display_name, topic_relat
         - INTERESTED_IN: Expressed interest or wants to learn
         - WORKING_ON: Currently working on projects/topics
         - IS_EXPERT_IN: Has expertise/experience in this area
+    
+    Topics are written with one UNWIND query per relationship type (see
+    update_knowledge_graph_batch) rather than one round-trip per topic.
     """
-    driver = get_driver()
-    with driver.session() as session:
+    update_knowledge_graph_batch([(user_id, display_name, topic_relationships, timestamp)])
+
+def update_knowledge_graph_batch(user_topic_relationships, chunk_size=500):
+    """
+    Write many users' topic relationships using UNWIND, one transaction per chunk.
+    
+    Rows are grouped by relationship type (Cypher cannot parameterise the
+    relationship type), so each chunk costs at most four round-trips instead
+    of one per user-topic pair.
+    
+    Args:
+        user_topic_relationships (list): List of tuples (user_id, display_name, topic_relationships, timestamp)
+        chunk_size (int): Maximum rows per transaction
+    """
+    rows_by_type = defaultdict(list)
+    for user_id, display_name, topic_relationships, timestamp in user_topic_relationships:
+        # One row per distinct (topic, relationship) within an update, so a topic the
+        # extractor repeated doesn't bump the mention count twice
+        seen = set()
         for topic, relationship_type in topic_relationships:
-            # Validate relationship type
-            valid_relationships = ["MENTIONS", "INTERESTED_IN", "WORKING_ON", "IS_EXPERT_IN"]
-            if relationship_type not in valid_relationships:
-                print(f"⚠️  Invalid relationship type '{relationship_type}', defaulting to 'MENTIONS'")
+            if relationship_type not in RELATIONSHIP_CONTEXTS:
+                logger.warning(f"⚠️  Invalid relationship type '{relationship_type}', defaulting to 'MENTIONS'")
                 relationship_type = "MENTIONS"
-            
-            # Create dynamic Cypher query based on relationship type
-            query = f"""
-                MERGE (u:User {{id: $user_id}})
-                SET u.name = $display_name
-                MERGE (t:Topic {{name: $topic}})
-                MERGE (u)-[r:{relationship_type}]->(t)
-                ON CREATE SET r.count = 1, r.firstMentioned = $ts, r.lastMentioned = $ts, r.context = $context
-                ON MATCH SET r.count = r.count + 1, r.lastMentioned = $ts
-            """
-            
-            # Set context based on relationship type
-            context_map = {
-                "MENTIONS": "conversation",
-                "INTERESTED_IN": "learning_goal", 
-                "WORKING_ON": "active_project",
-                "IS_EXPERT_IN": "professional_expertise"
-            }
-            
-            session.run(
-                query,
-                user_id=user_id,
-                display_name=display_name,
-                topic=topic,
-                ts=timestamp,
-                context=context_map[relationship_type]
-            )
+            topic = topic.strip()
+            key = (topic.lower(), relationship_type)
+            if not topic or key in seen:
+                continue
+            seen.add(key)
+            rows_by_type[relationship_type].append({
+                "user_id": user_id,
+                "display_name": display_name,
+                "topic": topic,
+                "ts": timestamp
+            })
+    
+    def write_rows(tx, query, rows, context):
+        tx.run(query, rows=rows, context=context).consume()
+    
+    driver = get_driver()
+    with driver.session() as session:
+        for relationship_type, rows in rows_by_type.items():
+            query = MERGE_RELATIONSHIP_QUERIES[relationship_type]
+            for start in range(0, len(rows), chunk_size):
+                session.execute_write(write_rows, query, rows[start:start + chunk_size], RELATIONSHIP_CONTEXTS[relationship_type])
+
+def _graph_writer():
+    """Drain queued graph updates, writing up to GRAPH_WRITE_BATCH_SIZE per UNWIND batch."""
+    while True:
+        batch = [graph_write_queue.get()]
+        deadline = time.monotonic() + GRAPH_WRITE_FLUSH_INTERVAL
+        while len(batch) < GRAPH_WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(graph_write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            write_start = time.time()
+            update_knowledge_graph_batch(batch)
+            logger.info(f"📊 NEO4J BATCH WRITE: {len(batch)} updates ({time.time() - write_start:.2f}s)")
+        except Exception as e:
+            logger.error(f"❌ NEO4J BATCH WRITE FAILED: {len(batch)} updates dropped - {e}")
+
+def flush_graph_writes():
+    """Write any updates still queued (called at interpreter exit so they aren't lost)."""
+    batch = []
+    while True:
+        try:
+            batch.append(graph_write_queue.get_nowait())
+        except queue.Empty:
+            break
+    
+    if batch:
+        try:
+            update_knowledge_graph_batch(batch)
+            logger.info(f"📊 NEO4J BATCH WRITE: Flushed {len(batch)} queued updates")
+        except Exception as e:
+            logger.error(f"❌ NEO4J FLUSH FAILED: {len(batch)} updates dropped - {e}")
+
+def queue_knowledge_graph_update(user_id, display_name, topics, slack_ts):
+    """
+    Queue a MENTIONS update for the background batch writer instead of writing inline.
+    
+    Returns:
+        bool: True if queued, False if the queue is full and the update was dropped
+    """
+    global _graph_writer_thread
+    with _graph_writer_lock:
+        if _graph_writer_thread is None:
+            _graph_writer_thread = threading.Thread(target=_graph_writer, daemon=True)
+            _graph_writer_thread.start()
+            atexit.register(flush_graph_writes)
+    
+    try:
+        graph_write_queue.put_nowait((user_id, display_name, [(topic, "MENTIONS") for topic in topics], slack_ts))
+        return True
+    except queue.Full:
+        logger.warning(f"⚠️ NEO4J QUEUE FULL: Dropping update for {user_id}")
+        return False
 
 def update_knowledge_graph(user_id, display_name, topics, slack_ts):
     """
@@ -96,25 +250,22 @@ def get_user_relationships(user_id, relationship_type=None):
     Returns:
         list: List of relationships with topic and metadata
     """
-    driver = get_driver()
-    with driver.session() as session:
-        if relationship_type:
-            query = f"""
-                MATCH (u:User {{id: $user_id}})-[r:{relationship_type}]->(t:Topic)
-                RETURN t.name as topic, r.count as count, r.context as context, 
-                       r.firstMentioned as first, r.lastMentioned as last
-                ORDER BY r.count DESC
-            """
-        else:
-            query = """
-                MATCH (u:User {id: $user_id})-[r]->(t:Topic)
-                RETURN t.name as topic, type(r) as relationship, r.count as count, 
-                       r.context as context, r.firstMentioned as first, r.lastMentioned as last
-                ORDER BY r.count DESC
-            """
-        
-        result = session.run(query, user_id=user_id)
-        return [dict(record) for record in result]
+    if relationship_type:
+        query = f"""
+            MATCH (u:User {{id: $user_id}})-[r:{relationship_type}]->(t:Topic)
+            RETURN t.name as topic, r.count as count, r.context as context, 
+                   r.firstMentioned as first, r.lastMentioned as last
+            ORDER BY r.count DESC
+        """
+    else:
+        query = """
+            MATCH (u:User {id: $user_id})-[r]->(t:Topic)
+            RETURN t.name as topic, type(r) as relationship, r.count as count, 
+                   r.context as context, r.firstMentioned as first, r.lastMentioned as last
+            ORDER BY r.count DESC
+        """
+    
+    return run_read_query(query, user_id=user_id)
 
 def get_topic_experts(topic_name, limit=10):
     """
@@ -127,17 +278,14 @@ def get_topic_experts(topic_name, limit=10):
     Returns:
         list: List of users with their expertise level
     """
-    driver = get_driver()
-    with driver.session() as session:
-        query = """
-            MATCH (u:User)-[r:IS_EXPERT_IN]->(t:Topic {name: $topic_name})
-            RETURN u.id as user_id, u.name as name, r.count as expertise_level
-            ORDER BY r.count DESC
-            LIMIT $limit
-        """
-        
-        result = session.run(query, topic_name=topic_name, limit=limit)
-        return [dict(record) for record in result]
+    query = """
+        MATCH (u:User)-[r:IS_EXPERT_IN]->(t:Topic {name: $topic_name})
+        RETURN u.id as user_id, u.name as name, r.count as expertise_level
+        ORDER BY r.count DESC
+        LIMIT $limit
+    """
+    
+    return run_read_query(query, topic_name=topic_name, limit=limit)
 
 def get_users_working_on_topic(topic_name, limit=10):
     """
@@ -150,18 +298,15 @@ def get_users_working_on_topic(topic_name, limit=10):
     Returns:
         list: List of users actively working on the topic
     """
-    driver = get_driver()
-    with driver.session() as session:
-        query = """
-            MATCH (u:User)-[r:WORKING_ON]->(t:Topic {name: $topic_name})
-            RETURN u.id as user_id, u.name as name, r.count as activity_level,
-                   r.lastMentioned as last_activity
-            ORDER BY r.count DESC, r.lastMentioned DESC
-            LIMIT $limit
-        """
-        
-        result = session.run(query, topic_name=topic_name, limit=limit)
-        return [dict(record) for record in result]
+    query = """
+        MATCH (u:User)-[r:WORKING_ON]->(t:Topic {name: $topic_name})
+        RETURN u.id as user_id, u.name as name, r.count as activity_level,
+               r.lastMentioned as last_activity
+        ORDER BY r.count DESC, r.lastMentioned DESC
+        LIMIT $limit
+    """
+    
+    return run_read_query(query, topic_name=topic_name, limit=limit)
 
 def get_users_interested_in_topic(topic_name, limit=10):
     """
@@ -174,18 +319,15 @@ def get_users_interested_in_topic(topic_name, limit=10):
     Returns:
         list: List of users interested in the topic
     """
-    driver = get_driver()
-    with driver.session() as session:
-        query = """
-            MATCH (u:User)-[r:INTERESTED_IN]->(t:Topic {name: $topic_name})
-            RETURN u.id as user_id, u.name as name, r.count as interest_level,
-                   r.lastMentioned as last_mentioned
-            ORDER BY r.count DESC, r.lastMentioned DESC
-            LIMIT $limit
-        """
-        
-        result = session.run(query, topic_name=topic_name, limit=limit)
-        return [dict(record) for record in result]
+    query = """
+        MATCH (u:User)-[r:INTERESTED_IN]->(t:Topic {name: $topic_name})
+        RETURN u.id as user_id, u.name as name, r.count as interest_level,
+               r.lastMentioned as last_mentioned
+        ORDER BY r.count DESC, r.lastMentioned DESC
+        LIMIT $limit
+    """
+    
+    return run_read_query(query, topic_name=topic_name, limit=limit)
 
 def get_relevant_users_for_topics(topics, exclude_user_id=None, limit=5):
     """
@@ -200,86 +342,72 @@ def get_relevant_users_for_topics(topics, exclude_user_id=None, limit=5):
     Returns:
         dict: Dictionary mapping topics to lists of relevant users
     """
-    import time
     start_time = time.time()
+    # Per-topic details are only built when DEBUG logging is on
+    debug = logger.isEnabledFor(logging.DEBUG)
     
-    print(f"📊 GRAPH QUERY: Finding relevant users for {len(topics)} topics")
-    print(f"   Topics: {topics}")
-    print(f"   Exclude user: {exclude_user_id}")
-    print(f"   Limit per topic: {limit}")
+    logger.info(f"📊 GRAPH QUERY: Finding relevant users for {len(topics)} topics")
+    if debug:
+        logger.debug(f"   Topics: {topics}")
+        logger.debug(f"   Exclude user: {exclude_user_id}")
+        logger.debug(f"   Limit per topic: {limit}")
     
-    driver = get_driver()
     results = {}
     
     try:
-        with driver.session() as session:
-            for i, topic in enumerate(topics):
-                print(f"   Querying topic {i+1}/{len(topics)}: '{topic}'")
-                
-                # Build query to find users with any relationship to this topic
-                # Order by relationship priority and activity level
-                query = """
-                    MATCH (u:User)-[r]->(t:Topic {name: $topic_name})
-                    WHERE NOT u.id = $exclude_user_id
-                    RETURN u.id as user_id, u.name as name, type(r) as relationship,
-                           r.count as activity_level, r.lastMentioned as last_activity
-                    ORDER BY 
-                        CASE type(r)
-                            WHEN 'IS_EXPERT_IN' THEN 1
-                            WHEN 'WORKING_ON' THEN 2
-                            WHEN 'INTERESTED_IN' THEN 3
-                            ELSE 4
-                        END,
-                        r.count DESC,
-                        r.lastMentioned DESC
-                    LIMIT $limit
-                """
-                
-                query_start = time.time()
-                result = session.run(query, topic_name=topic, exclude_user_id=exclude_user_id, limit=limit)
-                topic_users = [dict(record) for record in result]
-                query_time = time.time() - query_start
-                
-                print(f"     Found {len(topic_users)} users ({query_time:.2f}s)")
-                
-                if topic_users:
-                    results[topic] = topic_users
-                    
-                    # Log user details
-                    rel_counts = {}
-                    for user in topic_users:
-                        rel = user['relationship']
-                        rel_counts[rel] = rel_counts.get(rel, 0) + 1
-                    
-                    print(f"     Relationship distribution: {rel_counts}")
-                    
-                    # Log top users
-                    for j, user in enumerate(topic_users[:3]):  # Show top 3
-                        print(f"       {j+1}. {user['name']} ({user['relationship']}, activity: {user['activity_level']})")
-                else:
-                    print(f"     No users found for topic '{topic}'")
+        # One round-trip for every topic: rank each topic's users, then keep the top $limit
+        query = """
+            UNWIND $topics AS topic_name
+            MATCH (u:User)-[r]->(t:Topic {name: topic_name})
+            WHERE NOT u.id = $exclude_user_id
+            WITH topic_name, u, r,
+                 CASE type(r)
+                     WHEN 'IS_EXPERT_IN' THEN 1
+                     WHEN 'WORKING_ON' THEN 2
+                     WHEN 'INTERESTED_IN' THEN 3
+                     ELSE 4
+                 END AS priority
+            ORDER BY topic_name, priority, r.count DESC, r.lastMentioned DESC
+            WITH topic_name, collect({
+                user_id: u.id, name: u.name, relationship: type(r),
+                activity_level: r.count, last_activity: r.lastMentioned
+            })[..$limit] AS topic_users
+            RETURN topic_name, topic_users
+        """
         
-        total_time = time.time() - start_time
-        unique_users = set()
-        total_matches = 0
+        records = run_read_query(query, topics=list(topics), exclude_user_id=exclude_user_id, limit=limit)
+        users_by_topic = {record["topic_name"]: record["topic_users"] for record in records}
+        
+        # Keep the caller's topic order
+        for topic in topics:
+            topic_users = users_by_topic.get(topic)
+            if not topic_users:
+                if debug:
+                    logger.debug(f"     No users found for topic '{topic}'")
+                continue
+            
+            results[topic] = topic_users
+            
+            if debug:
+                logger.debug(f"     '{topic}': {len(topic_users)} users")
+                rel_counts = Counter(user['relationship'] for user in topic_users)
+                logger.debug(f"     Relationship distribution: {dict(rel_counts)}")
+                for j, user in enumerate(topic_users[:3]):  # Show top 3
+                    logger.debug(f"       {j+1}. {user['name']} ({user['relationship']}, activity: {user['activity_level']})")
         
-        for topic_users in results.values():
-            total_matches += len(topic_users)
-            for user in topic_users:
-                unique_users.add(user['user_id'])
+        total_time = time.time() - start_time
+        logger.info(f"📊 GRAPH QUERY: Complete ({total_time:.2f}s) - {len(results)}/{len(topics)} topics with results")
         
-        print(f"📊 GRAPH QUERY: Complete ({total_time:.2f}s)")
-        print(f"   Total matches: {total_matches}")
-        print(f"   Unique users: {len(unique_users)}")
-        print(f"   Topics with results: {len(results)}/{len(topics)}")
+        if debug:
+            unique_users = {user['user_id'] for topic_users in results.values() for user in topic_users}
+            logger.debug(f"   Total matches: {sum(len(topic_users) for topic_users in results.values())}")
+            logger.debug(f"   Unique users: {len(unique_users)}")
         
         return results
         
     except Exception as e:
         total_time = time.time() - start_time
-        print(f"❌ GRAPH QUERY FAILED: {e} ({total_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ GRAPH QUERY FAILED: {e} ({total_time:.2f}s)")
         return {}
 
 def get_community_interests():
@@ -289,31 +417,28 @@ def get_community_interests():
     Returns:
         dict: Analysis of topics by relationship type
     """
-    driver = get_driver()
-    with driver.session() as session:
-        query = """
-            MATCH (u:User)-[r]->(t:Topic)
-            RETURN t.name as topic, type(r) as relationship, 
-                   count(r) as total_connections, 
-                   count(DISTINCT u) as unique_users
-            ORDER BY total_connections DESC
-        """
-        
-        result = session.run(query)
-        relationships = {}
-        
-        for record in result:
-            rel_type = record["relationship"]
-            if rel_type not in relationships:
-                relationships[rel_type] = []
-            
-            relationships[rel_type].append({
-                "topic": record["topic"],
-                "total_connections": record["total_connections"],
-                "unique_users": record["unique_users"]
-            })
+    query = """
+        MATCH (u:User)-[r]->(t:Topic)
+        RETURN t.name as topic, type(r) as relationship, 
+               count(r) as total_connections, 
+               count(DISTINCT u) as unique_users
+        ORDER BY total_connections DESC
+    """
+    
+    relationships = {}
+    
+    for record in run_read_query(query):
+        rel_type = record["relationship"]
+        if rel_type not in relationships:
+            relationships[rel_type] = []
         
-        return relationships
+        relationships[rel_type].append({
+            "topic": record["topic"],
+            "total_connections": record["total_connections"],
+            "unique_users": record["unique_users"]
+        })
+    
+    return relationships
 
 def close_driver():
     global _driver
@@ -0,0 +1,52 @@
+"""
+Buffered logging for the MLAI Slack Survey Bot.
+Handlers only push records onto an in-memory queue; a QueueListener thread formats
+them and writes to a buffered stdout stream, so event handlers never block on console I/O.
+"""
+
+import io
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+logger = logging.getLogger("mlai")
+
+def _buffered_stdout():
+    """Wrap stdout in a block-buffered text stream (flushed when full and at exit)."""
+    if not hasattr(sys.stdout, "buffer"):
+        return sys.stdout
+    return io.TextIOWrapper(
+        sys.stdout.buffer,
+        encoding="utf-8",
+        line_buffering=False,
+        write_through=False
+    )
+
+def _configure():
+    stream = _buffered_stdout()
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    listener.start()
+
+    def shutdown():
+        listener.stop()
+        stream.flush()
+        # Don't let the wrapper close the real stdout when it is garbage collected
+        if stream is not sys.stdout:
+            stream.detach()
+
+    atexit.register(shutdown)
+
+_configure()
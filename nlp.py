@@ -1,11 +1,88 @@
 import os
-from openai import OpenAI
+import re
+import io
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from openai_client import get_openai_client
 from prompts import (
     get_enhanced_topic_extraction_prompt,
-    get_enhanced_interest_extraction_prompt
+    get_structured_interest_extraction_prompt,
+    get_multi_profile_interest_extraction_prompt
 )
 
-client = OpenAI()
+# Child of the bot's "mlai" logger - the bot's handlers pick it up, while standalone
+# scripts only see it through their own logging configuration
+logger = logging.getLogger("mlai.nlp")
+
+# Share the process-wide OpenAI client so topic extraction, tagging decisions and
+# survey replies all reuse one keep-alive connection pool
+client = get_openai_client()
+
+# LRU cache of message topics keyed by a digest of the normalized text, so repeated messages skip the LLM
+TOPIC_CACHE_SIZE = 8192
+topic_cache = OrderedDict()
+topic_cache_lock = threading.Lock()
+# Extractions in progress (digest -> Future), so concurrent identical messages share one LLM call
+_topic_extractions_in_flight = {}
+# Slack user mentions (<@U123> or <@U123|name>) don't change a message's topics
+SLACK_MENTION_RE = re.compile(r"<@[A-Z0-9]+(?:\|[^>]*)?>")
+WHITESPACE_RE = re.compile(r"\s+")
+
+def _topic_cache_key(text):
+    """Digest of the message with mentions removed and whitespace/case normalized."""
+    normalized = WHITESPACE_RE.sub(" ", SLACK_MENTION_RE.sub("", text)).strip().lower()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+def extract_topics_cached(text):
+    """
+    Cached wrapper around extract_topics_with_relationships.
+    
+    Messages that differ only in case, whitespace or @-mentions share an entry, and
+    identical messages arriving while an extraction is in flight wait for its result.
+    Empty results are not cached so failed extractions are retried.
+    
+    Args:
+        text (str): Slack message content
+    
+    Returns:
+        list: List of tuples (topic, relationship_type)
+    """
+    key = _topic_cache_key(text)
+    with topic_cache_lock:
+        cached = topic_cache.get(key)
+        if cached is not None:
+            topic_cache.move_to_end(key)
+            logger.info(f"🧠 TOPIC EXTRACTION: Cache hit ({len(cached)} topic-relationship pairs)")
+            return list(cached)
+        
+        in_flight = _topic_extractions_in_flight.get(key)
+        if in_flight is None:
+            in_flight = _topic_extractions_in_flight[key] = Future()
+            owner = True
+        else:
+            owner = False
+    
+    if not owner:
+        logger.info(f"🧠 TOPIC EXTRACTION: Waiting on identical in-flight extraction")
+        return list(in_flight.result())
+    
+    topic_relationships = []
+    try:
+        topic_relationships = extract_topics_with_relationships(text)
+    finally:
+        with topic_cache_lock:
+            if topic_relationships:
+                topic_cache[key] = list(topic_relationships)
+                if len(topic_cache) > TOPIC_CACHE_SIZE:
+                    topic_cache.popitem(last=False)
+            del _topic_extractions_in_flight[key]
+        in_flight.set_result(list(topic_relationships))
+    return topic_relationships
 
 def extract_topics_with_relationships(text):
     """
@@ -18,12 +95,11 @@ def extract_topics_with_relationships(text):
         list: List of tuples (topic, relationship_type) where relationship_type is 
               one of: MENTIONS, WORKING_ON, INTERESTED_IN
     """
-    import time
     start_time = time.time()
     
-    print(f"🧠 TOPIC EXTRACTION: Starting analysis")
-    print(f"   Text length: {len(text)} chars")
-    print(f"   Text preview: {text[:100]}...")
+    logger.info(f"🧠 TOPIC EXTRACTION: Starting analysis")
+    logger.info(f"   Text length: {len(text)} chars")
+    logger.info(f"   Text preview: {text[:100]}...")
     
     try:
         # Call OpenAI API
@@ -40,55 +116,137 @@ def extract_topics_with_relationships(text):
         )
         api_time = time.time() - api_start
         
-        print(f"   OpenAI API call completed ({api_time:.2f}s)")
+        logger.info(f"   OpenAI API call completed ({api_time:.2f}s)")
         
         # Handle response
         if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-            print("   ⚠️ Token limit reached during extraction")
+            logger.warning("   ⚠️ Token limit reached during extraction")
             if response.output_text:
                 content = response.output_text.strip()
-                print(f"   Partial response recovered: {content}")
+                logger.info(f"   Partial response recovered: {content}")
             else:
-                print("   ❌ No response text available - token limit hit during reasoning")
+                logger.error("   ❌ No response text available - token limit hit during reasoning")
                 return []
         else:
             content = response.output_text.strip()
-            print(f"   ✅ Full response received: {content}")
+            logger.info(f"   ✅ Full response received: {content}")
         
-        # Parse the response
-        topic_relationships = []
-        
-        # Parse the Topic|RelationshipType format
-        for item in content.split(","):
-            item = item.strip()
-            if "|" in item:
-                topic, relationship = item.split("|", 1)
-                topic_relationships.append((topic.strip(), relationship.strip()))
-            else:
-                # Fallback: if no relationship specified, default to MENTIONS
-                topic_relationships.append((item.strip(), "MENTIONS"))
+        # Parse the Topic|RelationshipType format in one pass. Items without a
+        # relationship default to MENTIONS; empty items (e.g. a trailing comma) are dropped.
+        topic_relationships = [
+            (topic.strip(), relationship.strip() or "MENTIONS")
+            for topic, _, relationship in (item.partition("|") for item in content.split(","))
+            if topic.strip()
+        ]
         
         # Log extraction results
         total_time = time.time() - start_time
-        print(f"🧠 TOPIC EXTRACTION: Complete ({total_time:.2f}s)")
-        print(f"   Extracted {len(topic_relationships)} topic-relationship pairs")
+        logger.info(f"🧠 TOPIC EXTRACTION: Complete ({total_time:.2f}s)")
+        logger.info(f"   Extracted {len(topic_relationships)} topic-relationship pairs")
         
         # Log relationship distribution
         if topic_relationships:
-            rel_counts = {}
-            for _, rel in topic_relationships:
-                rel_counts[rel] = rel_counts.get(rel, 0) + 1
-            print(f"   Relationship distribution: {rel_counts}")
+            rel_counts = Counter(rel for _, rel in topic_relationships)
+            logger.info(f"   Relationship distribution: {dict(rel_counts)}")
         
         return topic_relationships
         
     except Exception as e:
         total_time = time.time() - start_time
-        print(f"❌ TOPIC EXTRACTION FAILED: {e} ({total_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ TOPIC EXTRACTION FAILED: {e} ({total_time:.2f}s)")
         return []
 
+# Structured output schema for profile interest extraction - the API guarantees
+# the reply matches it, so no free-text parsing or format retries are needed
+INTEREST_EXTRACTION_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "interests",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "interest": {"type": "string"},
+                            "relation": {"type": "string", "enum": ["IS_EXPERT_IN", "WORKING_ON", "INTERESTED_IN"]}
+                        },
+                        "required": ["interest", "relation"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["items"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Structured output schema for multi-profile extraction - one entry per profile index,
+# with relations constrained to the same enum as single-profile extraction
+MULTI_INTEREST_EXTRACTION_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "profile_interests",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "profiles": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "interests": INTEREST_EXTRACTION_FORMAT["format"]["schema"]["properties"]["items"]
+                        },
+                        "required": ["index", "interests"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["profiles"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def _build_interest_extraction_input(text):
+    """Build the responses API input for profile interest extraction."""
+    return [
+        {
+            "role": "user", 
+            "content": f"{get_structured_interest_extraction_prompt()}\n\nProfile to analyze:\n{text}"
+        }
+    ]
+
+def _parse_interest_response(response):
+    """
+    Parse a structured interest extraction response into (interest, relationship_type) tuples.
+    
+    Args:
+        response: OpenAI responses API result
+    
+    Returns:
+        list: List of tuples (interest, relationship_type)
+    """
+    if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
+        # Truncated JSON cannot be parsed reliably, so treat it as no result
+        logger.warning("Ran out of tokens during interest extraction")
+        return []
+    
+    return _parse_interest_content(response.output_text)
+
+def _parse_interest_content(content):
+    """Parse structured JSON output into (interest, relationship_type) tuples."""
+    return [
+        (item["interest"].strip(), item["relation"])
+        for item in json.loads(content)["items"]
+    ]
+
 def extract_interests_with_relationships(text):
     """
     Enhanced extraction that returns interests AND relationship types from LinkedIn profiles.
@@ -103,34 +261,186 @@ def extract_interests_with_relationships(text):
     response = client.responses.create(
         model="o3-mini",
         reasoning={"effort": "low"},
-        input=[
-            {
-                "role": "user", 
-                "content": f"{get_enhanced_interest_extraction_prompt()}\n\nProfile to analyze:\n{text}"
-            }
-        ]
+        input=_build_interest_extraction_input(text),
+        text=INTEREST_EXTRACTION_FORMAT
     )
     
+    return _parse_interest_response(response)
+
+def _build_multi_interest_extraction_input(texts):
+    """Build the responses API input for extracting interests from several profiles at once."""
+    profiles = "\n\n".join(f"### Profile {index}\n{text}" for index, text in enumerate(texts))
+    return [
+        {
+            "role": "user",
+            "content": f"{get_multi_profile_interest_extraction_prompt()}\n\nProfiles to analyze:\n{profiles}"
+        }
+    ]
+
+def _parse_multi_interest_response(response, count):
+    """
+    Parse a structured multi-profile response back into one result list per profile.
+    
+    Args:
+        response: OpenAI responses API result
+        count (int): Number of profiles that were sent
+    
+    Returns:
+        list: List (length count) of lists of (interest, relationship_type) tuples
+    
+    Raises:
+        ValueError: If the response is truncated or is missing a profile index
+    """
     if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-        print("Ran out of tokens during interest extraction")
-        if response.output_text:
-            content = response.output_text.strip()
-        else:
-            print("Ran out of tokens during reasoning")
-            return []
-    else:
-        content = response.output_text.strip()
-    
-    interest_relationships = []
-    
-    # Parse the Interest|RelationshipType format
-    for item in content.split(","):
-        item = item.strip()
-        if "|" in item:
-            interest, relationship = item.split("|", 1)
-            interest_relationships.append((interest.strip(), relationship.strip()))
-        else:
-            # Fallback: if no relationship specified, default to IS_EXPERT_IN for profiles
-            interest_relationships.append((item.strip(), "IS_EXPERT_IN"))
+        raise ValueError("Ran out of tokens during multi-profile interest extraction")
+    
+    by_index = {
+        profile["index"]: profile["interests"]
+        for profile in json.loads(response.output_text)["profiles"]
+    }
+    
+    results = []
+    for index in range(count):
+        if index not in by_index:
+            raise ValueError(f"Multi-profile response is missing profile {index}")
+        results.append([
+            (item["interest"].strip(), item["relation"])
+            for item in by_index[index]
+        ])
+    return results
+
+def extract_interests_with_relationships_multi(texts):
+    """
+    Extract interests for several profiles in one request, amortising the long system prompt.
+    
+    Args:
+        texts (list): Profile texts to analyze
+    
+    Returns:
+        list: One list of (interest, relationship_type) tuples per input text
+    """
+    response = client.responses.create(
+        model="o3-mini",
+        reasoning={"effort": "low"},
+        input=_build_multi_interest_extraction_input(texts),
+        text=MULTI_INTEREST_EXTRACTION_FORMAT
+    )
+    
+    return _parse_multi_interest_response(response, len(texts))
+
+async def extract_interests_with_relationships_multi_async(texts, async_client):
+    """
+    Async variant of extract_interests_with_relationships_multi.
+    
+    Args:
+        texts (list): Profile texts to analyze
+        async_client (AsyncOpenAI): Shared async OpenAI client
+    
+    Returns:
+        list: One list of (interest, relationship_type) tuples per input text
+    """
+    response = await async_client.responses.create(
+        model="o3-mini",
+        reasoning={"effort": "low"},
+        input=_build_multi_interest_extraction_input(texts),
+        text=MULTI_INTEREST_EXTRACTION_FORMAT
+    )
+    
+    return _parse_multi_interest_response(response, len(texts))
+
+def _batch_output_text(body):
+    """Collect the output_text parts from a raw responses API body returned by the Batch API."""
+    parts = []
+    for item in body.get("output", []):
+        if item.get("type") != "message":
+            continue
+        for part in item.get("content", []):
+            if part.get("type") == "output_text":
+                parts.append(part.get("text", ""))
+    return "".join(parts).strip()
+
+def extract_interests_batch(texts_by_id, poll_interval=10, max_poll_interval=300):
+    """
+    Extract interests for many profiles via the OpenAI Batch API (50% cheaper, async turnaround).
+    
+    Args:
+        texts_by_id (dict): Mapping of custom_id (e.g. Airtable record ID) to profile text
+        poll_interval (float): Initial seconds between batch status checks
+        max_poll_interval (float): Upper bound for the exponential polling backoff
+    
+    Returns:
+        dict: Mapping of custom_id to list of (interest, relationship_type) tuples.
+              IDs whose request failed are omitted.
+    """
+    lines = []
+    for custom_id, text in texts_by_id.items():
+        lines.append(json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": {
+                "model": "o3-mini",
+                "reasoning": {"effort": "low"},
+                "input": _build_interest_extraction_input(text),
+                "text": INTEREST_EXTRACTION_FORMAT
+            }
+        }))
+    
+    batch_input = io.BytesIO("\n".join(lines).encode("utf-8"))
+    input_file = client.files.create(file=("interest_batch.jsonl", batch_input), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    logger.info(f"📦 BATCH API: Submitted {len(lines)} requests (batch {batch.id})")
+    
+    # Poll with exponential backoff until the batch reaches a terminal state
+    delay = poll_interval
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(delay)
+        batch = client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        logger.info(f"   Batch status: {batch.status} ({counts.completed}/{counts.total} done)")
+        delay = min(delay * 2, max_poll_interval)
+    
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} finished with status '{batch.status}'")
+    
+    results = {}
+    output = client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        if response.get("status_code") != 200:
+            logger.error(f"   ❌ Batch request {row.get('custom_id')} failed: {row.get('error')}")
+            continue
+        try:
+            results[row["custom_id"]] = _parse_interest_content(_batch_output_text(response["body"]))
+        except (ValueError, KeyError) as e:
+            logger.error(f"   ❌ Batch request {row.get('custom_id')} returned unparseable output: {e}")
+    
+    logger.info(f"📦 BATCH API: Parsed results for {len(results)}/{len(lines)} requests")
+    return results
+
+async def extract_interests_with_relationships_async(text, async_client):
+    """
+    Async variant of extract_interests_with_relationships for concurrent bulk extraction.
+    
+    Args:
+        text (str): LinkedIn profile or detailed bio content
+        async_client (AsyncOpenAI): Shared async OpenAI client
+    
+    Returns:
+        list: List of tuples (interest, relationship_type)
+    """
+    response = await async_client.responses.create(
+        model="o3-mini",
+        reasoning={"effort": "low"},
+        input=_build_interest_extraction_input(text),
+        text=INTEREST_EXTRACTION_FORMAT
+    )
     
-    return interest_relationships 
\ No newline at end of file
+    return _parse_interest_response(response)
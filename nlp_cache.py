@@ -0,0 +1,66 @@
+"""
+Persistent content-addressed cache for NLP extraction results.
+Keyed by sha256 of the analyzed text so unchanged Airtable InfoText is never re-sent to OpenAI.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+NLP_CACHE_PATH = os.environ.get("NLP_CACHE_PATH", ".nlp_cache.sqlite3")
+
+# Lazy loading for the SQLite connection
+_connection = None
+_connection_lock = threading.Lock()
+
+def get_connection():
+    """Get SQLite connection with lazy loading."""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(NLP_CACHE_PATH, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions (hash TEXT PRIMARY KEY, payload TEXT, ts INT)"
+        )
+        _connection.commit()
+    return _connection
+
+def text_hash(text: str) -> str:
+    """Return the cache key for a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def get(key: str):
+    """
+    Look up cached extraction results.
+
+    Args:
+        key (str): Hash from text_hash()
+
+    Returns:
+        list | None: List of (item, relationship_type) tuples, or None on a cache miss
+    """
+    with _connection_lock:
+        row = get_connection().execute(
+            "SELECT payload FROM extractions WHERE hash = ?", (key,)
+        ).fetchone()
+    if row is None:
+        return None
+    return [tuple(pair) for pair in json.loads(row[0])]
+
+def put(key: str, value):
+    """
+    Store extraction results.
+
+    Args:
+        key (str): Hash from text_hash()
+        value (list): List of (item, relationship_type) tuples
+    """
+    with _connection_lock:
+        connection = get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO extractions (hash, payload, ts) VALUES (?, ?, ?)",
+            (key, json.dumps(value), int(time.time()))
+        )
+        connection.commit()
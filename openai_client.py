@@ -0,0 +1,93 @@
+"""
+Shared OpenAI client for the bot and the offline extractors.
+Kept free of Slack, Airtable and logging_setup imports so standalone scripts
+can use it without pulling in the bot's dependencies.
+"""
+
+import os
+import json
+import httpx
+from openai import OpenAI
+from rate_limit import TokenBucket
+
+# OpenAI budget shared by every synchronous call in this process (requests and tokens per minute)
+OPENAI_RPM = int(os.environ.get("OPENAI_RPM", 500))
+OPENAI_TPM = int(os.environ.get("OPENAI_TPM", 200000))
+# Charged up front when a call doesn't set max_output_tokens, then reconciled with usage
+OPENAI_DEFAULT_OUTPUT_TOKENS = 2000
+# Retries for 429/5xx/connection errors - the SDK backs off exponentially with jitter and honors Retry-After
+OPENAI_MAX_RETRIES = 5
+
+# Lazy loading for OpenAI client
+_openai_client = None
+
+def get_openai_client():
+    """Get the shared OpenAI client with lazy loading (keeps HTTP connections alive between calls)."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = RateLimitedOpenAIClient(OpenAI(
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+            )
+        ))
+    return _openai_client
+
+class RateLimitedOpenAIClient:
+    """
+    Proxy around an OpenAI client that keeps responses.create within the RPM/TPM budget.
+    
+    Each call takes one request token and an estimate of its total tokens
+    (input characters / 4 plus the output allowance) from two shared buckets;
+    the token bucket is corrected with the reported usage afterwards.
+    Other attributes are passed straight through to the wrapped client.
+    """
+    
+    def __init__(self, openai_client, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM):
+        self._client = openai_client
+        self.responses = RateLimitedResponses(
+            openai_client.responses,
+            TokenBucket(rpm / 60, rpm),
+            TokenBucket(tpm / 60, tpm)
+        )
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+class RateLimitedResponses:
+    """
+    Proxy around client.responses that rate limits create().
+    
+    Other responses methods (retrieve, cancel, stream, ...) are passed straight
+    through to the wrapped resource.
+    """
+    
+    def __init__(self, responses, requests_bucket: TokenBucket, tokens_bucket: TokenBucket):
+        self._responses = responses
+        self._requests = requests_bucket
+        self._tokens = tokens_bucket
+    
+    def __getattr__(self, name):
+        return getattr(self._responses, name)
+    
+    def create(self, **kwargs):
+        estimated_tokens = len(json.dumps(kwargs.get("input", ""), default=str)) // 4 + kwargs.get("max_output_tokens", OPENAI_DEFAULT_OUTPUT_TOKENS)
+        self._requests.acquire()
+        self._tokens.acquire(estimated_tokens)
+        try:
+            response = self._responses.create(**kwargs)
+        except Exception:
+            self._tokens.adjust(-estimated_tokens)
+            raise
+        if kwargs.get("stream"):
+            return self._reconcile_stream(response, estimated_tokens)
+        if response.usage:
+            self._tokens.adjust(response.usage.total_tokens - estimated_tokens)
+        return response
+    
+    def _reconcile_stream(self, stream, estimated_tokens: int):
+        """Pass stream events through, correcting the token estimate once the final usage arrives."""
+        for event in stream:
+            if event.type in ("response.completed", "response.incomplete") and event.response.usage:
+                self._tokens.adjust(event.response.usage.total_tokens - estimated_tokens)
+            yield event
@@ -3,6 +3,8 @@ Bot prompts for the MLAI Slack Bot - Simplified Natural Conversation
 The bot now has a natural conversation and decides when to complete the survey.
 """
 
+import functools
+
 def get_system_prompt(user_id: str) -> str:
     """Get the system prompt for natural conversation."""
     
@@ -100,6 +102,29 @@ EXAMPLES:
 "Working on mobile app development" → Mobile|WORKING_ON
 "10 years Python experience, currently building data pipelines" → Python|IS_EXPERT_IN, Data Pipelines|WORKING_ON"""
 
+@functools.lru_cache(maxsize=None)
+def get_structured_interest_extraction_prompt() -> str:
+    """Interest extraction prompt for use with the JSON schema structured output format."""
+    
+    return get_enhanced_interest_extraction_prompt() + """
+
+STRUCTURED OUTPUT (overrides OUTPUT FORMAT above):
+Return a JSON object with an "items" list. Each item has "interest" (1-2 words) and "relation" (IS_EXPERT_IN, WORKING_ON or INTERESTED_IN).
+Example: {"items": [{"interest": "AI", "relation": "IS_EXPERT_IN"}, {"interest": "Sales", "relation": "WORKING_ON"}]}"""
+
+@functools.lru_cache(maxsize=None)
+def get_multi_profile_interest_extraction_prompt() -> str:
+    """Interest extraction prompt for several profiles per request, for use with the multi-profile JSON schema."""
+    
+    return get_enhanced_interest_extraction_prompt() + """
+
+MULTIPLE PROFILES MODE (overrides OUTPUT FORMAT above):
+You will receive several profiles, each starting with a header like "### Profile 0".
+Apply all the rules above to each profile independently.
+Return a JSON object with a "profiles" list containing one entry per profile. Each entry has "index" (the profile number) and "interests", a list of items with "interest" (1-2 words) and "relation" (IS_EXPERT_IN, WORKING_ON or INTERESTED_IN).
+Include every index, using an empty "interests" list when a profile has no interests.
+Example: {"profiles": [{"index": 0, "interests": [{"interest": "AI", "relation": "IS_EXPERT_IN"}]}, {"index": 1, "interests": []}]}"""
+
 def get_warm_tagging_personality_prompt() -> str:
     """MLAI bot personality - playful but expert, warm and encouraging with Australian edge."""
     
@@ -258,4 +283,19 @@ EXAMPLES:
 "Food, Lunch" → NO (casual)
 
 OUTPUT:
-Respond with only "YES" or "NO" - nothing else.""" 
\ No newline at end of file
+Respond with only "YES" or "NO" - nothing else."""
+
+
+def get_conversation_summary_prompt(previous_summary: str, transcript: str) -> str:
+    """Prompt for folding older survey exchanges into a short running summary."""
+    
+    return f"""You are summarizing an MLAI community survey conversation so it can continue with less context.
+
+SUMMARY SO FAR:
+{previous_summary or "(none)"}
+
+NEW EXCHANGES TO FOLD IN:
+{transcript}
+
+Write an updated summary of what the user has shared so far (background, interests, goals, anything they asked for) and which questions have already been asked.
+Keep it under 80 words. Only output the summary, no other text."""
@@ -0,0 +1,92 @@
+"""
+Token-bucket rate limiters shared by the bot and the offline extractors.
+A bucket refills at a steady rate and allows short bursts up to its capacity,
+so fast responses don't leave the rate budget idle the way fixed sleeps do.
+"""
+
+import time
+import asyncio
+import threading
+
+class AsyncTokenBucket:
+    """Token-bucket limiter for asyncio code."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum tokens that can accumulate (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self._updated_at is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1):
+        """Wait until the requested number of tokens is available, then consume them."""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            self._refill(loop.time())
+            if self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill(loop.time())
+            self._tokens -= tokens
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+class TokenBucket:
+    """Thread-safe token-bucket limiter for synchronous code."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum tokens that can accumulate (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1):
+        """Block until the requested number of tokens is available, then consume them."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                time.sleep((tokens - self._tokens) / self.rate)
+                self._refill(time.monotonic())
+            self._tokens -= tokens
+
+    def adjust(self, tokens: float):
+        """
+        Charge (or refund, if negative) tokens without waiting.
+
+        Used to reconcile an up-front estimate with the actual cost once it is known;
+        the balance may go negative, which delays later acquire() calls.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
@@ -3,66 +3,311 @@ Utility functions for the MLAI Slack Survey Bot
 """
 
 import os
+import re
+import logging
+import json
 import time
+import random
 import threading
+import functools
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from slack_sdk.errors import SlackApiError
 from pyairtable import Api
-from openai import OpenAI
+from pyairtable.formulas import match
+from rate_limit import TokenBucket
+from openai_client import get_openai_client
+from logging_setup import logger
 from prompts import (
     get_system_prompt, 
     get_warm_tagging_personality_prompt,
     get_topic_expansion_prompt,
-    get_tagging_decision_prompt
+    get_tagging_decision_prompt,
+    get_conversation_summary_prompt
 )
-# Removed unused import: extract_topics
-from graph import update_knowledge_graph, get_relevant_users_for_topics
 
 # Configuration
 AIRTABLE_API_KEY = os.environ.get("AIRTABLE_API_KEY")
 AIRTABLE_BASE_ID = os.environ.get("AIRTABLE_BASE_ID")
 AIRTABLE_TABLE_NAME = os.environ.get("AIRTABLE_TABLE", "SlackUsers")
 AIRTABLE_COLUMN_NAME = os.environ.get("AIRTABLE_COLUMN_NAME", "SlackID")
-ADMIN_USER_IDS = os.environ.get("ADMIN_USER_IDS", "").split(",")
+ADMIN_USER_IDS = frozenset(uid.strip() for uid in os.environ.get("ADMIN_USER_IDS", "").split(",") if uid.strip())
 
-# Global state management
+# Global state management - each user's state is guarded by one of a fixed set of
+# striped locks, so unrelated conversations don't serialize on a single lock
 conversation_state = {}
-conversation_lock = threading.Lock()
+conversation_updated_at = {}  # user_id -> monotonic time of the last change, for expiry
+CONVERSATION_LOCK_STRIPES = 32
+conversation_locks = [threading.RLock() for _ in range(CONVERSATION_LOCK_STRIPES)]
+
+def _conversation_lock(user_id: str):
+    """Lock guarding this user's entry in conversation_state."""
+    return conversation_locks[hash(user_id) % CONVERSATION_LOCK_STRIPES]
+
+# Optional Redis backend for conversation state - set REDIS_URL to share state
+# across bot processes and keep it across restarts
+REDIS_URL = os.environ.get("REDIS_URL")
+CONVERSATION_KEY_PREFIX = "pesto:conv:"
+CONVERSATION_INDEX_KEY = "pesto:conv:active"  # sorted set of user_id -> expiry time
+CONVERSATION_STATE_TTL = 86400  # 24 hours
 
 # Cooldown tracking for tagging
 user_tag_cooldowns = {}
 cooldown_lock = threading.Lock()
 
+# Slack display name cache (user_id -> (display name, cached at)), LRU-bounded with a TTL
+display_name_cache = OrderedDict()
+display_name_lock = threading.Lock()
+DISPLAY_NAME_CACHE_SIZE = 10000
+DISPLAY_NAME_CACHE_TTL = 600  # 10 minutes, so profile renames are picked up
+DISPLAY_NAME_REFRESH_INTERVAL = DISPLAY_NAME_CACHE_TTL // 2  # re-list the directory before entries expire
+
+# Airtable lookup caches: Slack user ID -> (record ID, cached at) for the default table,
+# and (table, column, name column) -> (users, cached at) for /trigger-survey reads
+airtable_record_id_cache = OrderedDict()
+airtable_user_list_cache = {}
+airtable_cache_lock = threading.Lock()
+AIRTABLE_RECORD_ID_CACHE_TTL = 3600  # 1 hour
+AIRTABLE_USER_LIST_CACHE_TTL = 300  # 5 minutes
+AIRTABLE_RECORD_ID_CACHE_SIZE = 10000
+
+# DM channel IDs never change for a user, so conversations.open only needs to run once per user
+dm_channel_cache = OrderedDict()
+dm_channel_lock = threading.Lock()
+DM_CHANNEL_CACHE_SIZE = 10000
+
+# Survey prompts keep the latest messages verbatim and fold older ones into a running summary.
+# The summary is refreshed once SUMMARY_REFRESH_MESSAGES more messages fall outside the window.
+CONVERSATION_WINDOW_MESSAGES = 12  # 6 exchanges
+SUMMARY_REFRESH_MESSAGES = 6
+
+# The system prompt tells the bot to end with "Thank you for sharing! Your responses have been recorded."
+SURVEY_COMPLETION_RE = re.compile(r"thank you for sharing.*responses have been recorded", re.IGNORECASE | re.DOTALL)
+
+# Surveys end automatically this long after they start (seconds)
+SURVEY_TIMEOUT = 600  # 10 minutes
+
+# Cached opening survey question (prompt hash -> (question, cached at))
+first_question_cache = {}
+first_question_lock = threading.Lock()
+FIRST_QUESTION_CACHE_TTL = 3600  # 1 hour
+# Generations in progress (prompt hash -> Future), so a burst of survey starts shares one request
+_first_questions_in_flight = {}
+
+# Minimum seconds between partial-response updates when streaming a reply into Slack
+STREAM_UPDATE_INTERVAL = 1.0
+
 # Cooldown configuration (in seconds)
 USER_TAG_COOLDOWN = 3600  # 1 hour cooldown per user
 CHANNEL_TAG_COOLDOWN = 300  # 5 minutes between any tags in a channel
 
+# Channel cooldown tracking (channel_id -> last tag time). Single-key reads and
+# writes of a dict are atomic, so the hot-path check doesn't take a lock.
+channel_tag_cooldowns = {}
+
+# should_suggest_users decisions keyed by (channel_id, frozenset(topics)) -> (decision, decided at)
+suggestion_decision_cache = OrderedDict()
+suggestion_decision_lock = threading.Lock()
+SUGGESTION_DECISION_CACHE_SIZE = 1000
+
+# Number of survey DMs sent concurrently (the Slack client still throttles each API method)
+NOTIFY_WORKER_COUNT = int(os.environ.get("NOTIFY_WORKER_COUNT", 3))
+# Survey invites per minute across all notify workers (chat.postMessage is a Tier 3 method)
+NOTIFY_DMS_PER_MINUTE = 50
+
 # Initialize clients
 api = Api(AIRTABLE_API_KEY)
 
-# Lazy loading for OpenAI client
-_openai_client = None
+class RateLimitedSlackClient:
+    """
+    Proxy around a Slack WebClient that throttles chat.*, users.* and conversations.* calls.
+    
+    Each API method gets its own token bucket, and calls rejected with
+    "ratelimited" are retried after the Retry-After delay Slack returns.
+    Other attributes are passed straight through to the wrapped client.
+    """
+    
+    RATE_LIMITED_PREFIXES = ("chat_", "users_", "conversations_")
+    
+    def __init__(self, app_client, rate: float = 1, capacity: float = 3, max_attempts: int = 3):
+        self._client = app_client
+        self._rate = rate
+        self._capacity = capacity
+        self._max_attempts = max_attempts
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+    
+    def _bucket(self, method_name: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._buckets.get(method_name)
+            if bucket is None:
+                bucket = self._buckets[method_name] = TokenBucket(self._rate, self._capacity)
+            return bucket
+    
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith(self.RATE_LIMITED_PREFIXES) or not callable(attr):
+            return attr
+        
+        bucket = self._bucket(name)
+        
+        def call(*args, **kwargs):
+            for attempt in range(1, self._max_attempts + 1):
+                bucket.acquire()
+                try:
+                    return attr(*args, **kwargs)
+                except SlackApiError as e:
+                    if e.response.get("error") != "ratelimited" or attempt == self._max_attempts:
+                        raise
+                    retry_after = int(e.response.headers.get("Retry-After", 1))
+                    logger.warning(f"⏳ SLACK RATE LIMITED: {name} - retrying in {retry_after}s (attempt {attempt}/{self._max_attempts})")
+                    time.sleep(retry_after)
+        
+        return call
 
-def get_openai_client():
-    """Get OpenAI client with lazy loading."""
-    global _openai_client
-    if _openai_client is None:
-        _openai_client = OpenAI()
-    return _openai_client
+@functools.lru_cache(maxsize=None)
+def _get_graph():
+    """Import the graph module (and Neo4j driver) on first use."""
+    import graph
+    return graph
 
 def is_admin(user_id: str) -> bool:
     """Check if user is an admin."""
     return user_id in ADMIN_USER_IDS
 
+# Lazy loading for the Redis client
+_redis_client = None
+
+def get_redis_client():
+    """Get the Redis client with lazy loading, or None when REDIS_URL isn't configured."""
+    global _redis_client
+    if _redis_client is None and REDIS_URL:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+def _encode_state(state: dict) -> str:
+    """Serialize conversation state to JSON, keeping datetimes (e.g. start_time) round-trippable."""
+    return json.dumps(state, default=lambda value: {"__datetime__": value.isoformat()})
+
+def _decode_state(raw) -> dict:
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=lambda obj: datetime.fromisoformat(obj["__datetime__"]) if "__datetime__" in obj else obj)
+
+def _modify_conversation_state(user_id: str, modify) -> dict:
+    """
+    Atomically apply modify(state) to a user's conversation state.
+    
+    Uses a WATCH/MULTI transaction on Redis, or the user's striped lock for the in-memory dict.
+    
+    Returns:
+        dict: Copy of the updated state
+    """
+    redis_client = get_redis_client()
+    if redis_client is None:
+        with _conversation_lock(user_id):
+            state = conversation_state.setdefault(user_id, {})
+            modify(state)
+            conversation_updated_at[user_id] = time.monotonic()
+            return state.copy()
+    
+    key = CONVERSATION_KEY_PREFIX + user_id
+    
+    def transaction(pipe):
+        state = _decode_state(pipe.get(key))
+        modify(state)
+        pipe.multi()
+        pipe.set(key, _encode_state(state), ex=CONVERSATION_STATE_TTL)
+        pipe.zadd(CONVERSATION_INDEX_KEY, {user_id: time.time() + CONVERSATION_STATE_TTL})
+        return state
+    
+    return redis_client.transaction(transaction, key, value_from_callable=True)
+
+def count_active_conversations() -> int:
+    """Number of users with conversation state."""
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return len(conversation_state)
+    return redis_client.zcount(CONVERSATION_INDEX_KEY, time.time(), "+inf")
+
 def get_conversation_state(user_id: str) -> dict:
     """Get conversation state for a user."""
-    with conversation_lock:
-        return conversation_state.get(user_id, {})
+    return safe_get_conversation_state(user_id)
 
 def set_conversation_state(user_id: str, state: dict):
     """Set conversation state for a user."""
-    with conversation_lock:
-        conversation_state[user_id] = state
+    def replace(current):
+        current.clear()
+        current.update(state)
+    _modify_conversation_state(user_id, replace)
+
+def _display_name_from_user(user: dict) -> str:
+    """Pick the best display name from a Slack user object."""
+    return user.get("profile", {}).get("display_name") or user.get("real_name", "unknown")
+
+def _cache_display_name(user_id: str, display_name: str):
+    """Store a display name, evicting the least recently used entry when full."""
+    with display_name_lock:
+        display_name_cache[user_id] = (display_name, time.time())
+        display_name_cache.move_to_end(user_id)
+        if len(display_name_cache) > DISPLAY_NAME_CACHE_SIZE:
+            display_name_cache.popitem(last=False)
+
+def warm_display_name_cache(app_client) -> int:
+    """
+    Pre-resolve display names for the whole workspace with paginated users.list.
+    
+    Returns:
+        int: Number of users cached
+    """
+    cached = 0
+    cursor = None
+    try:
+        while True:
+            response = app_client.users_list(limit=200, cursor=cursor)
+            for user in response.get("members", []):
+                _cache_display_name(user["id"], _display_name_from_user(user))
+                cached += 1
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+        logger.info(f"👤 USER CACHE: Warmed with {cached} users")
+    except Exception as e:
+        logger.error(f"❌ USER CACHE WARM-UP FAILED after {cached} users: {e}")
+    return cached
+
+def display_name_refresh_loop(app_client):
+    """Re-list the workspace directory every DISPLAY_NAME_REFRESH_INTERVAL seconds."""
+    stop = threading.Event()
+    while not stop.wait(DISPLAY_NAME_REFRESH_INTERVAL):
+        warm_display_name_cache(app_client)
+
+def get_display_name(app_client, user_id: str) -> str:
+    """
+    Get a user's display name from the cache, falling back to users.info on a miss or expired entry.
+    
+    If users.info fails (e.g. rate limited) and an expired entry exists, the stale
+    name is returned instead of failing the lookup.
+    """
+    with display_name_lock:
+        cached = display_name_cache.get(user_id)
+        if cached and time.time() - cached[1] < DISPLAY_NAME_CACHE_TTL:
+            display_name_cache.move_to_end(user_id)
+            return cached[0]
+    
+    try:
+        user_info = app_client.users_info(user=user_id)
+    except Exception as e:
+        if cached:
+            logger.warning(f"⚠️ USER LOOKUP: users.info failed for {user_id} ({e}) - using cached name")
+            return cached[0]
+        raise
+    display_name = _display_name_from_user(user_info["user"])
+    _cache_display_name(user_id, display_name)
+    return display_name
 
 def is_user_in_cooldown(user_id: str) -> bool:
     """Check if a user is in cooldown period for tagging."""
@@ -75,6 +320,14 @@ def update_user_cooldown(user_id: str):
     with cooldown_lock:
         user_tag_cooldowns[user_id] = time.time()
 
+def is_channel_in_cooldown(channel_id: str) -> bool:
+    """Check if a channel was tagged within the last CHANNEL_TAG_COOLDOWN seconds."""
+    return time.time() - channel_tag_cooldowns.get(channel_id, 0) < CHANNEL_TAG_COOLDOWN
+
+def update_channel_cooldown(channel_id: str):
+    """Update the cooldown timestamp for a channel."""
+    channel_tag_cooldowns[channel_id] = time.time()
+
 def get_cooldown_remaining(user_id: str) -> int:
     """Get remaining cooldown time in seconds for a user."""
     with cooldown_lock:
@@ -116,21 +369,116 @@ def clear_expired_cooldowns():
             del user_tag_cooldowns[user_id]
         
         if expired_users:
-            print(f"🧹 COOLDOWN CLEANUP: Removed {len(expired_users)} expired cooldowns")
+            logger.info(f"🧹 COOLDOWN CLEANUP: Removed {len(expired_users)} expired cooldowns")
         
         return len(expired_users)
 
+def clear_expired_conversations():
+    """
+    Drop in-memory conversation states untouched for CONVERSATION_STATE_TTL seconds.
+    
+    Mirrors the key expiry Redis applies when REDIS_URL is set (no-op in that case).
+    """
+    if get_redis_client() is not None:
+        return 0
+    
+    cutoff = time.monotonic() - CONVERSATION_STATE_TTL
+    expired = 0
+    for user_id, updated_at in list(conversation_updated_at.items()):
+        if updated_at > cutoff:
+            continue
+        with _conversation_lock(user_id):
+            # Re-check under the lock in case the state changed since the scan
+            if conversation_updated_at.get(user_id, cutoff + 1) <= cutoff:
+                conversation_state.pop(user_id, None)
+                conversation_updated_at.pop(user_id, None)
+                expired += 1
+    
+    if expired:
+        logger.info(f"🧹 CONVERSATION CLEANUP: Removed {expired} expired conversation states")
+    
+    return expired
+
 def safe_get_conversation_state(user_id: str):
     """Thread-safe get conversation state."""
-    with conversation_lock:
-        return conversation_state.get(user_id, {}).copy()
+    redis_client = get_redis_client()
+    if redis_client is None:
+        with _conversation_lock(user_id):
+            return conversation_state.get(user_id, {}).copy()
+    return _decode_state(redis_client.get(CONVERSATION_KEY_PREFIX + user_id))
 
 def safe_update_conversation_state(user_id: str, updates: dict):
     """Thread-safe update conversation state."""
-    with conversation_lock:
-        if user_id not in conversation_state:
-            conversation_state[user_id] = {}
-        conversation_state[user_id].update(updates)
+    _modify_conversation_state(user_id, lambda state: state.update(updates))
+
+def new_conversation_state(**overrides) -> dict:
+    """
+    Build the canonical initial conversation state, with any fields overridden.
+    
+    Every path that creates or resets a user's state starts from this, so all
+    states carry the same fields.
+    """
+    state = {
+        "step": "not_started",
+        "conversation_history": [],
+        "exchange_count": 0,
+        "history_summary": None,
+        "summarized_count": 0,
+        "start_time": None,
+        "start_time_ns": None,
+        "thread_ts": None,
+        "user_name": "there",
+        "airtable_record_id": None,
+        "dm_channel": None
+    }
+    state.update(overrides)
+    return state
+
+def ensure_conversation_state(user_id: str) -> dict:
+    """
+    Atomically fill in any missing default fields of a user's state (creating it if needed).
+    
+    Returns:
+        dict: Copy of the resulting state
+    """
+    def fill_defaults(state):
+        for key, value in new_conversation_state().items():
+            state.setdefault(key, value)
+    
+    return _modify_conversation_state(user_id, fill_defaults)
+
+def safe_start_conversation(user_id: str, thread_ts: str) -> tuple:
+    """
+    Atomically mark a user's survey as started if it has not been started yet.
+    
+    Args:
+        user_id (str): Slack user ID
+        thread_ts (str): Timestamp of the invite message, kept for DM threading if not already set
+    
+    Returns:
+        tuple: (copy of the resulting state, previous step) - a started or completed
+               survey is left untouched, so start times are only stamped on the first start
+    """
+    previous = {}
+    
+    def start(state):
+        previous["step"] = state.get("step")
+        # A repeat click must not restart the timeout clock of a running survey
+        if previous["step"] == "started":
+            return
+        for key, value in new_conversation_state().items():
+            state.setdefault(key, value)
+        if not state["thread_ts"]:
+            state["thread_ts"] = thread_ts
+        if state["step"] == "not_started":
+            state["step"] = "started"
+            state["start_time"] = datetime.now()
+            # The monotonic clock is per-process, so it can't be shared through Redis
+            if get_redis_client() is None:
+                state["start_time_ns"] = time.monotonic_ns()
+    
+    state = _modify_conversation_state(user_id, start)
+    return state, previous["step"]
 
 def safe_say(say_func, message: str, user_id: str = None, max_retries: int = 3):
     """Safely send a message with rate limiting protection."""
@@ -140,28 +488,45 @@ def safe_say(say_func, message: str, user_id: str = None, max_retries: int = 3):
             return True
         except SlackApiError as e:
             if e.response.get('error') == 'ratelimited':
-                wait_time = 2 ** attempt
-                print(f"Rate limited. Waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
+                # Honor Retry-After when Slack sends it; jitter keeps concurrent senders from retrying in lockstep
+                retry_after = int(e.response.headers.get("Retry-After", 0))
+                wait_time = max(retry_after, 1) + random.uniform(0, 2 ** attempt)
+                logger.warning(f"Rate limited. Waiting {wait_time:.1f}s before retry {attempt + 1}/{max_retries}")
                 time.sleep(wait_time)
             else:
-                print(f"Slack API error for user {user_id}: {e}")
+                logger.error(f"Slack API error for user {user_id}: {e}")
                 return False
         except Exception as e:
-            print(f"Unexpected error sending message to {user_id}: {e}")
+            logger.exception(f"Unexpected error sending message to {user_id}: {e}")
             return False
     
-    print(f"Failed to send message to {user_id} after {max_retries} attempts")
+    logger.error(f"Failed to send message to {user_id} after {max_retries} attempts")
     return False
 
+def get_dm_channel(app_client, user_id: str) -> str:
+    """Return the DM channel ID for a user, opening it via Slack only on first use."""
+    with dm_channel_lock:
+        channel_id = dm_channel_cache.get(user_id)
+        if channel_id:
+            dm_channel_cache.move_to_end(user_id)
+            return channel_id
+    
+    channel_id = app_client.conversations_open(users=user_id)["channel"]["id"]
+    with dm_channel_lock:
+        dm_channel_cache[user_id] = channel_id
+        if len(dm_channel_cache) > DM_CHANNEL_CACHE_SIZE:
+            dm_channel_cache.popitem(last=False)
+    return channel_id
+
 def safe_dm(app_client, user_id, message):
     """Send message directly to user's DM, maintaining thread continuity."""
     try:
-        dm_channel = app_client.conversations_open(users=user_id)["channel"]["id"]
-        
         # Get the thread_ts for this conversation to maintain continuity
         state = safe_get_conversation_state(user_id)
         thread_ts = state.get("thread_ts")
         
+        dm_channel = state.get("dm_channel") or get_dm_channel(app_client, user_id)
+        
         # Build message payload
         payload = {
             "channel": dm_channel,
@@ -175,19 +540,39 @@ def safe_dm(app_client, user_id, message):
         app_client.chat_postMessage(**payload)
         return True
     except Exception as e:
-        print(f"Failed to DM {user_id}: {e}")
+        logger.error(f"Failed to DM {user_id}: {e}")
         return False
 
+def cache_airtable_record_id(user_id: str, record_id: str, cached_at: float):
+    """Remember a user's record ID in the default table, evicting the least recently cached user."""
+    with airtable_cache_lock:
+        airtable_record_id_cache[user_id] = (record_id, cached_at)
+        airtable_record_id_cache.move_to_end(user_id)
+        if len(airtable_record_id_cache) > AIRTABLE_RECORD_ID_CACHE_SIZE:
+            airtable_record_id_cache.popitem(last=False)
+
 def get_user_ids_from_table(table_id: str = None, column_name: str = None, name_column: str = "Name"):
     """Fetch Slack User IDs and names from a specific Airtable table."""
     target_table_id = table_id or AIRTABLE_TABLE_NAME
     target_column = column_name or AIRTABLE_COLUMN_NAME
     
-    print(f"Fetching user IDs and names from Airtable base '{AIRTABLE_BASE_ID}', table '{target_table_id}', columns '{target_column}' and '{name_column}'...")
+    logger.info(f"Fetching user IDs and names from Airtable base '{AIRTABLE_BASE_ID}', table '{target_table_id}', columns '{target_column}' and '{name_column}'...")
+    
+    cache_key = (target_table_id, target_column, name_column)
+    with airtable_cache_lock:
+        cached = airtable_user_list_cache.get(cache_key)
+    if cached and time.time() - cached[1] < AIRTABLE_USER_LIST_CACHE_TTL:
+        logger.info(f"Using cached user list for table '{target_table_id}' ({len(cached[0])} user(s)).")
+        return list(cached[0]), target_table_id
     
     try:
         airtable_table = api.table(AIRTABLE_BASE_ID, target_table_id)
-        records = airtable_table.all()
+        # Only fetch the two columns we read to keep page payloads small
+        records = airtable_table.all(fields=[target_column, name_column])
+        
+        # Record IDs are only reusable for the table/column conversations are saved to
+        is_default_table = target_table_id == AIRTABLE_TABLE_NAME and target_column == AIRTABLE_COLUMN_NAME
+        now = time.time()
         
         users = []
         for rec in records:
@@ -197,47 +582,142 @@ def get_user_ids_from_table(table_id: str = None, column_name: str = None, name_
             if user_id:  # Only include records with valid user IDs
                 users.append({
                     "id": user_id,
-                    "name": user_name
+                    "name": user_name,
+                    "record_id": rec["id"] if is_default_table else None
                 })
+                if is_default_table:
+                    cache_airtable_record_id(user_id, rec["id"], now)
+        
+        with airtable_cache_lock:
+            airtable_user_list_cache[cache_key] = (users, now)
         
-        print(f"Found {len(users)} user(s) in table '{target_table_id}'.")
-        return users, target_table_id
+        logger.info(f"Found {len(users)} user(s) in table '{target_table_id}'.")
+        return list(users), target_table_id
         
     except Exception as e:
-        print(f"Error fetching from table '{target_table_id}': {e}")
+        logger.exception(f"Error fetching from table '{target_table_id}': {e}")
         return [], target_table_id
 
-def is_survey_timed_out(user_id: str) -> bool:
-    """Check if the survey has timed out (10 minutes since start)."""
-    state = safe_get_conversation_state(user_id)
+def is_survey_timed_out(user_id: str, state: dict = None) -> bool:
+    """
+    Check if the survey has timed out (SURVEY_TIMEOUT seconds since start).
+    
+    Args:
+        user_id (str): Slack user ID
+        state (dict, optional): Already-loaded conversation state, to avoid a second read
+    """
+    if state is None:
+        state = safe_get_conversation_state(user_id)
     if not state:
         return False
     
+    # Monotonic start time is only recorded for in-process state - it is immune to clock changes
+    start_time_ns = state.get("start_time_ns")
+    if start_time_ns is not None:
+        return time.monotonic_ns() - start_time_ns > SURVEY_TIMEOUT * 1_000_000_000
+    
     start_time = state.get("start_time")
     if not start_time:
         return False
     
     elapsed = datetime.now() - start_time
-    return elapsed > timedelta(minutes=10)
+    return elapsed > timedelta(seconds=SURVEY_TIMEOUT)
+
+def summarize_conversation_history(user_id: str, state: dict) -> tuple:
+    """
+    Fold survey messages that fell out of the prompt window into the running summary.
+    
+    The full conversation_history is kept for the Airtable save; only the prompt is trimmed.
+    
+    Args:
+        user_id (str): Slack user ID
+        state (dict): The user's current conversation state
+    
+    Returns:
+        tuple: (summary text or None, number of history messages the summary covers)
+    """
+    history = state.get("conversation_history", [])
+    summary = state.get("history_summary")
+    summarized_count = state.get("summarized_count", 0)
+    
+    if len(history) - summarized_count <= CONVERSATION_WINDOW_MESSAGES + SUMMARY_REFRESH_MESSAGES:
+        return summary, summarized_count
+    
+    fold_until = len(history) - CONVERSATION_WINDOW_MESSAGES
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in history[summarized_count:fold_until])
+    
+    try:
+        response = get_openai_client().responses.create(
+            model="o3-mini",
+            reasoning={"effort": "low"},
+            input=[{"role": "user", "content": get_conversation_summary_prompt(summary, transcript)}]
+        )
+        new_summary = response.output_text.strip() if response.output_text else ""
+    except Exception as e:
+        logger.warning(f"⚠️ CONVERSATION SUMMARY FAILED: {user_id} - {e}")
+        return summary, summarized_count
+    
+    if not new_summary:
+        return summary, summarized_count
+    
+    logger.info(f"📝 CONVERSATION SUMMARY: Folded {fold_until - summarized_count} messages for user {user_id}")
+    safe_update_conversation_state(user_id, {"history_summary": new_summary, "summarized_count": fold_until})
+    return new_summary, fold_until
 
-def get_openai_response(user_id: str, user_message: str):
-    """Get conversational response from OpenAI based on conversation state."""
+def _stream_openai_response(on_partial, **kwargs):
+    """
+    Run a streaming responses.create call, reporting the text so far as it arrives.
+    
+    Args:
+        on_partial (callable): Called with the accumulated text, at most every STREAM_UPDATE_INTERVAL seconds
+    
+    Returns:
+        The final Response object (same shape as a non-streaming call)
+    """
+    parts = []
+    last_update = time.monotonic()
+    final_response = None
+    
+    for event in get_openai_client().responses.create(stream=True, **kwargs):
+        if event.type == "response.output_text.delta":
+            parts.append(event.delta)
+            now = time.monotonic()
+            if now - last_update >= STREAM_UPDATE_INTERVAL:
+                last_update = now
+                try:
+                    on_partial("".join(parts))
+                except Exception as e:
+                    logger.warning(f"⚠️ STREAM UPDATE FAILED: {e}")
+        elif event.type in ("response.completed", "response.incomplete"):
+            final_response = event.response
+        elif event.type in ("response.failed", "error"):
+            raise RuntimeError(f"OpenAI stream failed: {event}")
+    
+    if final_response is None:
+        raise RuntimeError("OpenAI stream ended without a final response")
+    return final_response
+
+def get_openai_response(user_id: str, user_message: str, on_partial=None):
+    """
+    Get conversational response from OpenAI based on conversation state.
+    
+    Args:
+        user_id (str): Slack user ID
+        user_message (str): The user's message (or the first-question trigger)
+        on_partial (callable, optional): If given, the reply is streamed and this is called
+            with the text so far, so the caller can show it before the reply is complete
+    """
     
     # Get current state safely
     state = safe_get_conversation_state(user_id)
     
     # Initialize conversation state if new user
     if not state:
-        safe_update_conversation_state(user_id, {
-            "step": "not_started",
-            "conversation_history": [],
-            "start_time": None
-        })
-        state = safe_get_conversation_state(user_id)
+        state = ensure_conversation_state(user_id)
     
     # Check if survey has timed out (10 minutes)
-    if state["step"] == "started" and is_survey_timed_out(user_id):
-        print(f"⏰ Survey timed out for user {user_id} after 10 minutes")
+    if state["step"] == "started" and is_survey_timed_out(user_id, state):
+        logger.info(f"⏰ Survey timed out for user {user_id} after 10 minutes")
         safe_update_conversation_state(user_id, {"step": "completed"})
         save_full_conversation_to_airtable(user_id)
         return "Thanks for your time! The survey has timed out and your responses have been saved."
@@ -255,7 +735,7 @@ def get_openai_response(user_id: str, user_message: str):
         system_prompt = get_system_prompt(user_id)
         
         # Add conversation flow context to help maintain continuity
-        conversation_length = len(state["conversation_history"]) // 2  # Divide by 2 since we store both user and bot messages
+        conversation_length = state.get("exchange_count", len(state["conversation_history"]) // 2)  # Older states predate the counter
         if conversation_length > 0:
             system_prompt += f"\n\nCONVERSATION CONTEXT: This is exchange #{conversation_length + 1} in an ongoing conversation. Maintain natural flow and reference previous responses when appropriate."
     else:
@@ -264,36 +744,74 @@ def get_openai_response(user_id: str, user_message: str):
     # Don't add trigger messages to conversation history
     is_trigger_message = user_message in ["Please ask the first question", "start survey"]
     
-    # Add conversation history
+    # Add conversation history - older messages are represented by the running summary
     messages = [{"role": "system", "content": system_prompt}]
     
+    history_summary, summarized_count = summarize_conversation_history(user_id, state)
+    if history_summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation: {history_summary}"})
+    
     # Add previous conversation
-    for msg in state["conversation_history"]:
+    for msg in state["conversation_history"][summarized_count:]:
         messages.append(msg)
     
     # Only add non-trigger messages to conversation
     if not is_trigger_message:
         messages.append({"role": "user", "content": user_message})
     
+    llm_input = (
+        f"System instructions and conversation context:\n{messages[0]['content']}\n\n" +
+        "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages[1:]])
+    )
+    
+    # The opening question has the same prompt for every user, so reuse a recent answer
+    first_question_key = None
+    first_question_future = None  # set when this call generates the question others wait on
+    if is_trigger_message and not state["conversation_history"]:
+        first_question_key = hashlib.sha256(llm_input.encode("utf-8")).hexdigest()
+        in_flight = None
+        with first_question_lock:
+            cached = first_question_cache.get(first_question_key)
+            if not cached or time.time() - cached[1] >= FIRST_QUESTION_CACHE_TTL:
+                cached = None
+                in_flight = _first_questions_in_flight.get(first_question_key)
+                if in_flight is None:
+                    first_question_future = _first_questions_in_flight[first_question_key] = Future()
+        
+        if cached:
+            logger.info(f"💬 FIRST QUESTION: Cache hit for user {user_id}")
+            return cached[0]
+        
+        if in_flight is not None:
+            logger.info(f"💬 FIRST QUESTION: Waiting on in-flight generation for user {user_id}")
+            question = in_flight.result()
+            if question:
+                return question
+            # The shared generation failed - ask OpenAI for this user instead
+    
+    request = {
+        "model": "o3-mini",
+        "reasoning": {"effort": "low"},
+        "input": [
+            {
+                "role": "user", 
+                "content": llm_input
+            }
+        ]
+    }
+    
     try:
-        response = get_openai_client().responses.create(
-            model="o3-mini",
-            reasoning={"effort": "low"},
-            input=[
-                {
-                    "role": "user", 
-                    "content": f"System instructions and conversation context:\n{messages[0]['content']}\n\n" + 
-                             "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages[1:]])
-                }
-            ]
-        )
+        if on_partial:
+            response = _stream_openai_response(on_partial, **request)
+        else:
+            response = get_openai_client().responses.create(**request)
         
         if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-            print("Ran out of tokens during conversation response")
+            logger.warning("Ran out of tokens during conversation response")
             if response.output_text:
                 bot_response = response.output_text.strip()
             else:
-                print("Ran out of tokens during reasoning")
+                logger.warning("Ran out of tokens during reasoning")
                 bot_response = "I'm sorry, I need to think more about that. Could you please try again?"
         else:
             bot_response = response.output_text.strip()
@@ -301,98 +819,139 @@ def get_openai_response(user_id: str, user_message: str):
         # Ensure we have a valid response
         if not bot_response or bot_response.strip() == "":
             bot_response = "I'm sorry, I didn't catch that. Could you please try again?"
+        elif first_question_key and response.status != "incomplete":
+            with first_question_lock:
+                first_question_cache[first_question_key] = (bot_response, time.time())
         
         # Add to conversation history
         if not is_trigger_message:
-            current_state = safe_get_conversation_state(user_id)
-            updated_history = current_state["conversation_history"].copy()
-            updated_history.append({"role": "user", "content": user_message})
-            updated_history.append({"role": "assistant", "content": bot_response})
-            safe_update_conversation_state(user_id, {"conversation_history": updated_history})
+            def append_exchange(current_state):
+                current_state.setdefault("conversation_history", []).extend([
+                    {"role": "user", "content": user_message},
+                    {"role": "assistant", "content": bot_response}
+                ])
+                current_state["exchange_count"] = current_state.get("exchange_count", 0) + 1
+            
+            _modify_conversation_state(user_id, append_exchange)
         
         # Check if bot is ending the conversation
-        if "thank you for sharing" in bot_response.lower() and "responses have been recorded" in bot_response.lower():
+        if SURVEY_COMPLETION_RE.search(bot_response):
             safe_update_conversation_state(user_id, {"step": "completed"})
             # Save the full conversation to Airtable
             save_full_conversation_to_airtable(user_id)
-            print(f"✅ Survey completed for user {user_id}")
+            logger.info(f"✅ Survey completed for user {user_id}")
         
         return bot_response
         
     except Exception as e:
-        print(f"OpenAI API error: {e}")
+        logger.exception(f"OpenAI API error: {e}")
         return "Sorry, I'm having trouble responding right now. Please try again!"
+    
+    finally:
+        # Hand the cached question (or None on failure) to any callers that waited on this one
+        if first_question_future is not None:
+            with first_question_lock:
+                _first_questions_in_flight.pop(first_question_key, None)
+                cached = first_question_cache.get(first_question_key)
+            first_question_future.set_result(cached[0] if cached else None)
 
 def save_full_conversation_to_airtable(user_id: str):
     """Save the full conversation to Airtable."""
     try:
-        print(f"Saving full conversation for user {user_id} to Airtable...")
+        logger.info(f"Saving full conversation for user {user_id} to Airtable...")
         
         # Create table client for the default table
         airtable_table = api.table(AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME)
         
         # Format the full conversation for storage
-        full_conversation = ""
         state = safe_get_conversation_state(user_id)
-        if state:
-            conversation_history = state.get("conversation_history", [])
-            
-            for msg in conversation_history:
-                role = "Bot" if msg["role"] == "assistant" else "User"
-                full_conversation += f"{role}: {msg['content']}\n\n"
+        conversation_history = state.get("conversation_history", []) if state else []
+        full_conversation = "\n\n".join(
+            f"{'Bot' if msg['role'] == 'assistant' else 'User'}: {msg['content']}"
+            for msg in conversation_history
+        ).strip()
         
         # Find the record for the user
-        print(f"Looking for user record with {AIRTABLE_COLUMN_NAME} = '{user_id}'")
-        
-        try:
-            records = airtable_table.all()
-            user_record = None
-            
-            # Find the matching record manually
-            for record in records:
-                if record["fields"].get(AIRTABLE_COLUMN_NAME) == user_id:
-                    user_record = record
-                    break
-                    
-            print(f"Found {len(records)} total records in table")
-            
-        except Exception as search_error:
-            print(f"Error searching records: {search_error}")
-            user_record = None
+        logger.info(f"Looking for user record with {AIRTABLE_COLUMN_NAME} = '{user_id}'")
+        
+        record_id = state.get("airtable_record_id") if state else None
+        with airtable_cache_lock:
+            cached = airtable_record_id_cache.get(user_id)
+        if record_id:
+            logger.info(f"Using record ID {record_id} saved when user {user_id} was invited")
+        elif cached and time.time() - cached[1] < AIRTABLE_RECORD_ID_CACHE_TTL:
+            record_id = cached[0]
+            logger.info(f"Using cached record ID {record_id} for user {user_id}")
+        else:
+            try:
+                # Let Airtable filter server-side and return at most one matching record
+                user_record = airtable_table.first(
+                    formula=match({AIRTABLE_COLUMN_NAME: user_id}),
+                    fields=[AIRTABLE_COLUMN_NAME]
+                )
+                if user_record:
+                    record_id = user_record["id"]
+                
+            except Exception as search_error:
+                logger.warning(f"Error searching records: {search_error}")
         
         # Prepare the data to save
         save_data = {
-            "FullConvo": full_conversation.strip()
+            "FullConvo": full_conversation
         }
         
-        if user_record:
-            record_id = user_record["id"]
-            print(f"Found matching record ID {record_id} for user {user_id}. Updating with full conversation.")
+        if record_id:
+            logger.info(f"Found matching record ID {record_id} for user {user_id}. Updating with full conversation.")
             
             # Update only this specific record
             airtable_table.update(record_id, save_data)
-            print(f"Successfully updated record {record_id} for user {user_id}")
+            logger.info(f"Successfully updated record {record_id} for user {user_id}")
             
         else:
             # Create new record if user not found
-            print(f"No existing record found for user {user_id}. Creating a new one.")
+            logger.info(f"No existing record found for user {user_id}. Creating a new one.")
             save_data[AIRTABLE_COLUMN_NAME] = user_id
             new_record = airtable_table.create(save_data)
-            print(f"Successfully created new record {new_record['id']} for user {user_id}")
+            record_id = new_record["id"]
+            logger.info(f"Successfully created new record {record_id} for user {user_id}")
+        
+        cache_airtable_record_id(user_id, record_id, time.time())
+        safe_update_conversation_state(user_id, {"airtable_record_id": record_id})
             
     except Exception as e:
-        print(f"Error saving to Airtable for user {user_id}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error saving to Airtable for user {user_id}: {e}")
+
+# Survey invite content shared by every DM - only the greeting name varies
+SURVEY_INVITE_TEXT = (
+    "👋 Hi {user_name}! Meet Pesto, the AI-powered community engagement bot!\n\n"
+    "Pesto is here to help enhance our community experience by providing insightful conversations and fostering meaningful connections.\n\n"
+    "We're running an experiment to improve engagement and would love your input, can you please answer a few questions?"
+)
+SURVEY_INVITE_ACTIONS_BLOCK = {
+    "type": "actions",
+    "elements": [
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "🚀 Yes, I'd love to help!"
+            },
+            "style": "primary",
+            "action_id": "start_survey_button"
+        }
+    ]
+}
 
-def send_dm_to_user_id(app_client, user_id: str, user_name: str = "there"):
-    """Send initial DM to start the conversation."""
+def send_dm_to_user_id(app_client, user_id: str, user_name: str = "there", record_id: str = None) -> bool:
+    """
+    Send initial DM to start the conversation. Returns True if the DM was sent.
+    
+    record_id is the user's row in the default Airtable table, if known, so the
+    finished conversation can be saved without looking the row up again.
+    """
     try:
-        print(f"Attempting to open DM with User ID: {user_id} ({user_name})")
-        res = app_client.conversations_open(users=user_id)
-        channel_id = res["channel"]["id"]
-        
-        time.sleep(0.5)
+        logger.info(f"Attempting to open DM with User ID: {user_id} ({user_name})")
+        channel_id = get_dm_channel(app_client, user_id)
         
         response = app_client.chat_postMessage(
             channel=channel_id,
@@ -402,97 +961,87 @@ def send_dm_to_user_id(app_client, user_id: str, user_name: str = "there"):
                     "type": "section",
                     "text": {
                         "type": "mrkdwn",
-                        "text": f"""👋 Hi {user_name}! Meet Pesto, the AI-powered community engagement bot!\n\nPesto is here to help enhance our community experience by providing insightful conversations and fostering meaningful connections.\n\nWe're running an experiment to improve engagement and would love your input, can you please answer a few questions?"""
+                        "text": SURVEY_INVITE_TEXT.format(user_name=user_name)
                     }
                 },
-                {
-                    "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": "🚀 Yes, I'd love to help!"
-                            },
-                            "style": "primary",
-                            "action_id": "start_survey_button"
-                        }
-                    ]
-                }
+                SURVEY_INVITE_ACTIONS_BLOCK
             ]
         )
         
         # Initialize conversation state with thread_ts to maintain DM continuity
-        safe_update_conversation_state(user_id, {
-            "step": "not_started",
-            "conversation_history": [],
-            "start_time": None,
-            "thread_ts": response["ts"],  # Save the timestamp for threading
-            "user_name": user_name  # Store the user's name for future use
-        })
-        
-        print(f"Successfully sent initial DM to User ID: {user_id} ({user_name}) (thread_ts: {response['ts']})")
+        set_conversation_state(user_id, new_conversation_state(
+            thread_ts=response["ts"],  # Save the timestamp for threading
+            user_name=user_name,  # Store the user's name for future use
+            airtable_record_id=record_id,
+            dm_channel=channel_id  # Carried with the state so other processes skip conversations.open
+        ))
+        
+        logger.info(f"Successfully sent initial DM to User ID: {user_id} ({user_name}) (thread_ts: {response['ts']})")
+        return True
     except SlackApiError as e:
-        print(f"Error DM-ing {user_id} ({user_name}): {e.response['error']}")
+        logger.error(f"Error DM-ing {user_id} ({user_name}): {e.response['error']}")
     except Exception as e:
-        print(f"Unexpected error sending DM to {user_id} ({user_name}): {e}")
+        logger.exception(f"Unexpected error sending DM to {user_id} ({user_name}): {e}")
+    return False
 
 def notify_users_in_table(app_client, table_id: str = None, column_name: str = None, test_mode: bool = False):
-    """Send DMs to all users in a specific Airtable table."""
-    print(f"🔄 notify_users_in_table called with:")
-    print(f"   table_id: {table_id}")
-    print(f"   column_name: {column_name}")
-    print(f"   test_mode: {test_mode}")
+    """
+    Send DMs to all users in a specific Airtable table.
+    
+    DMs are sent on a small thread pool, paced by a token bucket (on top of the
+    rate-limited Slack client), and results are streamed as they complete.
+    
+    Yields:
+        str: Slack user ID of each user that was DMed successfully
+    """
+    logger.info(f"🔄 notify_users_in_table called with:")
+    logger.info(f"   table_id: {table_id}")
+    logger.info(f"   column_name: {column_name}")
+    logger.info(f"   test_mode: {test_mode}")
     
     try:
         user_ids, actual_table_id = get_user_ids_from_table(table_id, column_name)
-        print(f"📋 get_user_ids_from_table returned:")
-        print(f"   user_ids: {user_ids}")
-        print(f"   actual_table_id: {actual_table_id}")
+        logger.info(f"📋 get_user_ids_from_table returned:")
+        logger.info(f"   user_ids: {user_ids}")
+        logger.info(f"   actual_table_id: {actual_table_id}")
     except Exception as e:
-        print(f"❌ Error in get_user_ids_from_table: {e}")
+        logger.error(f"❌ Error in get_user_ids_from_table: {e}")
         raise
     
     if not user_ids:
-        print(f"⚠️ No user IDs found in table '{actual_table_id}'. Exiting.")
-        return 0
+        logger.warning(f"⚠️ No user IDs found in table '{actual_table_id}'. Exiting.")
+        return
 
-    print(f"✅ Found {len(user_ids)} users in table '{actual_table_id}'")
+    logger.info(f"✅ Found {len(user_ids)} users in table '{actual_table_id}'")
     
     if test_mode:
         first_user_id = user_ids[0]["id"]
-        print(f"🧪 TEST MODE: Sending DM to first user only: {first_user_id}")
-        try:
-            send_dm_to_user_id(app_client, first_user_id, user_ids[0]["name"])
-            print(f"✅ Test DM sent successfully to {first_user_id}")
-            return 1
-        except Exception as e:
-            print(f"❌ Error sending test DM to {first_user_id}: {e}")
-            raise
-    else:
-        print(f"📤 Sending DMs to all {len(user_ids)} users...")
-        success_count = 0
-        
-        for i, user_info in enumerate(user_ids, 1):
-            user_id = user_info["id"]
-            user_name = user_info["name"]
-            try:
-                print(f"📨 Sending DM {i}/{len(user_ids)} to user: {user_id} ({user_name})")
-                send_dm_to_user_id(app_client, user_id, user_name)
+        logger.info(f"🧪 TEST MODE: Sending DM to first user only: {first_user_id}")
+        if send_dm_to_user_id(app_client, first_user_id, user_ids[0]["name"], user_ids[0]["record_id"]):
+            logger.info(f"✅ Test DM sent successfully to {first_user_id}")
+            yield first_user_id
+        return
+    
+    logger.info(f"📤 Sending DMs to all {len(user_ids)} users...")
+    success_count = 0
+    
+    # Pace the whole fan-out; per-method throttling and 429 retries live in the Slack client
+    dm_bucket = TokenBucket(NOTIFY_DMS_PER_MINUTE / 60, NOTIFY_DMS_PER_MINUTE)
+    
+    def send(user_info):
+        dm_bucket.acquire()
+        return user_info["id"], send_dm_to_user_id(app_client, user_info["id"], user_info["name"], user_info["record_id"])
+    
+    with ThreadPoolExecutor(max_workers=NOTIFY_WORKER_COUNT, thread_name_prefix="notify") as executor:
+        futures = [executor.submit(send, user_info) for user_info in user_ids]
+        for i, future in enumerate(as_completed(futures), 1):
+            user_id, sent = future.result()
+            if sent:
                 success_count += 1
-                print(f"✅ DM {i} sent successfully")
-                
-                if i < len(user_ids):
-                    print(f"⏳ Waiting 2 seconds before next DM...")
-                    time.sleep(2)
-                    
-            except Exception as e:
-                print(f"❌ Error sending DM {i} to {user_id} ({user_name}): {e}")
-                # Continue with other users instead of failing completely
-                continue
-            
-        print(f"📊 Final results: {success_count}/{len(user_ids)} DMs sent successfully")
-        return success_count 
+                logger.info(f"✅ DM {i}/{len(user_ids)} sent successfully to {user_id}")
+                yield user_id
+    
+    logger.info(f"📊 Final results: {success_count}/{len(user_ids)} DMs sent successfully")
 
 def expand_topics_for_matching(canonical_topics):
     """
@@ -504,11 +1053,10 @@ def expand_topics_for_matching(canonical_topics):
     Returns:
         list: Expanded list including original topics and their synonyms
     """
-    import time
     start_time = time.time()
     
-    print(f"🔍 TOPIC EXPANSION: Expanding {len(canonical_topics)} canonical topics using o3-mini")
-    print(f"   Canonical topics: {canonical_topics}")
+    logger.info(f"🔍 TOPIC EXPANSION: Expanding {len(canonical_topics)} canonical topics using o3-mini")
+    logger.info(f"   Canonical topics: {canonical_topics}")
     
     try:
         # Create prompt for LLM to expand topics
@@ -517,7 +1065,7 @@ def expand_topics_for_matching(canonical_topics):
 
         # Call o3-mini
         llm_start = time.time()
-        client = OpenAI()
+        client = get_openai_client()
         response = client.responses.create(
             model="o3-mini",
             reasoning={"effort": "low"},
@@ -530,20 +1078,20 @@ def expand_topics_for_matching(canonical_topics):
         )
         llm_time = time.time() - llm_start
         
-        print(f"   o3-mini API call completed ({llm_time:.2f}s)")
+        logger.info(f"   o3-mini API call completed ({llm_time:.2f}s)")
         
         # Handle response
         if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-            print("   ⚠️ Token limit reached during topic expansion")
+            logger.warning("   ⚠️ Token limit reached during topic expansion")
             if response.output_text:
                 content = response.output_text.strip()
-                print(f"   Partial response recovered")
+                logger.info(f"   Partial response recovered")
             else:
-                print("   ❌ No response text available - falling back to original topics")
+                logger.error("   ❌ No response text available - falling back to original topics")
                 return canonical_topics
         else:
             content = response.output_text.strip()
-            print(f"   ✅ Full expansion received")
+            logger.info(f"   ✅ Full expansion received")
         
         # Parse the response
         expanded_topics = []
@@ -568,21 +1116,19 @@ def expand_topics_for_matching(canonical_topics):
                 seen_topics.add(topic)
         
         total_time = time.time() - start_time
-        print(f"🔍 TOPIC EXPANSION: Complete ({total_time:.2f}s)")
-        print(f"   Original: {len(canonical_topics)} topics")
-        print(f"   Expanded: {len(expanded_topics)} topics")
-        print(f"   Expansion ratio: {len(expanded_topics)/len(canonical_topics):.1f}x")
+        logger.info(f"🔍 TOPIC EXPANSION: Complete ({total_time:.2f}s)")
+        logger.info(f"   Original: {len(canonical_topics)} topics")
+        logger.info(f"   Expanded: {len(expanded_topics)} topics")
+        logger.info(f"   Expansion ratio: {len(expanded_topics)/len(canonical_topics):.1f}x")
         
         return expanded_topics
         
     except Exception as e:
         total_time = time.time() - start_time
-        print(f"❌ TOPIC EXPANSION FAILED: {e} ({total_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ TOPIC EXPANSION FAILED: {e} ({total_time:.2f}s)")
         
         # Fallback to original topics
-        print(f"   🔄 Falling back to original topics: {canonical_topics}")
+        logger.info(f"   🔄 Falling back to original topics: {canonical_topics}")
         return canonical_topics
 
 def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_suggestions=3):
@@ -598,33 +1144,32 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
     Returns:
         dict: Formatted suggestions with users and rationale
     """
-    import time
     start_time = time.time()
     
-    print(f"🔍 USER SUGGESTION: Starting for canonical topics={topics}, exclude={exclude_user_id}")
+    logger.info(f"🔍 USER SUGGESTION: Starting for canonical topics={topics}, exclude={exclude_user_id}")
     
     try:
         # Expand topics to include synonyms for better matching
         expanded_topics = expand_topics_for_matching(topics)
-        print(f"   Expanded to {len(expanded_topics)} topic variations: {expanded_topics}")
+        logger.info(f"   Expanded to {len(expanded_topics)} topic variations: {expanded_topics}")
         
         # Get relevant users for all expanded topics
         # Request more users than needed to account for cooldowns (trickle down)
         extended_limit = max_suggestions * 3  # Request 3x more users for trickle down
         graph_start = time.time()
-        relevant_users = get_relevant_users_for_topics(expanded_topics, exclude_user_id, limit=extended_limit)
+        relevant_users = _get_graph().get_relevant_users_for_topics(expanded_topics, exclude_user_id, limit=extended_limit)
         graph_time = time.time() - graph_start
         
-        print(f"   Graph query completed ({graph_time:.2f}s)")
-        print(f"   Requested {extended_limit} users (3x {max_suggestions}) for trickle down")
+        logger.info(f"   Graph query completed ({graph_time:.2f}s)")
+        logger.info(f"   Requested {extended_limit} users (3x {max_suggestions}) for trickle down")
         
         if not relevant_users:
-            print(f"   No relevant users found in graph")
+            logger.info(f"   No relevant users found in graph")
             return None
         
         # Log raw results
         total_matches = sum(len(users) for users in relevant_users.values())
-        print(f"   Found {total_matches} total user matches across {len(relevant_users)} topics")
+        logger.info(f"   Found {total_matches} total user matches across {len(relevant_users)} topics")
         
         # Format suggestions (use original canonical topics, not expanded ones)
         suggestions = {
@@ -636,7 +1181,7 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
         # Collect unique users across all topics with their best relationship
         user_map = {}
         for found_topic, users in relevant_users.items():
-            print(f"   Topic '{found_topic}': {len(users)} users")
+            logger.info(f"   Topic '{found_topic}': {len(users)} users")
             
             # Map found topic back to canonical topic for consistency
             canonical_topic = found_topic
@@ -673,7 +1218,7 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
                 elif user['relationship'] == 'WORKING_ON' and user_map[user_id]['best_relationship'] != 'IS_EXPERT_IN':
                     user_map[user_id]['best_relationship'] = 'WORKING_ON'
         
-        print(f"   Consolidated to {len(user_map)} unique users")
+        logger.info(f"   Consolidated to {len(user_map)} unique users")
         
         # Sort by relationship priority and activity level
         sorted_users = sorted(user_map.values(), key=lambda u: (
@@ -682,7 +1227,7 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
             -u['activity_level']
         ))
         
-        print(f"   Sorted candidate pool: {len(sorted_users)} users")
+        logger.info(f"   Sorted candidate pool: {len(sorted_users)} users")
         
         # Filter out users in cooldown
         available_users = []
@@ -703,16 +1248,17 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
         
         # Log cooldown filtering with trickle down effect
         if cooldown_filtered:
-            print(f"⏱️ COOLDOWN FILTER: {len(cooldown_filtered)} users in cooldown (trickle down in effect):")
-            for item in cooldown_filtered[:3]:  # Show first 3
-                user = item['user']
-                minutes = item['remaining_minutes']
-                rank = item['original_rank']
-                print(f"     - #{rank} {user['name']} ({minutes}m remaining)")
-            if len(cooldown_filtered) > 3:
-                print(f"     ... and {len(cooldown_filtered) - 3} more")
+            logger.info(f"⏱️ COOLDOWN FILTER: {len(cooldown_filtered)} users in cooldown (trickle down in effect):")
+            if logger.isEnabledFor(logging.DEBUG):
+                for item in cooldown_filtered[:3]:  # Show first 3
+                    user = item['user']
+                    minutes = item['remaining_minutes']
+                    rank = item['original_rank']
+                    logger.debug(f"     - #{rank} {user['name']} ({minutes}m remaining)")
+                if len(cooldown_filtered) > 3:
+                    logger.debug(f"     ... and {len(cooldown_filtered) - 3} more")
         else:
-            print(f"⏱️ COOLDOWN FILTER: No users in cooldown")
+            logger.info(f"⏱️ COOLDOWN FILTER: No users in cooldown")
         
         # Take top suggestions from available users
         top_users = available_users[:max_suggestions]
@@ -721,31 +1267,31 @@ def suggest_relevant_users(topics, exclude_user_id=None, channel_id=None, max_su
         # Check if we have enough users after trickle down
         if len(top_users) < max_suggestions and len(available_users) < max_suggestions:
             shortage = max_suggestions - len(available_users)
-            print(f"⚠️ TRICKLE DOWN: Only {len(available_users)} users available (need {max_suggestions})")
-            print(f"   Consider: {shortage} top users are in cooldown - this is working as intended!")
+            logger.warning(f"⚠️ TRICKLE DOWN: Only {len(available_users)} users available (need {max_suggestions})")
+            logger.info(f"   Consider: {shortage} top users are in cooldown - this is working as intended!")
         
         # Log trickle down effect
         if available_users:
-            print(f"🔄 TRICKLE DOWN: Final selection from {len(available_users)} available users:")
-            for i, user in enumerate(top_users):
-                rel_count = len(user['relationships'])
-                # Find original ranking before cooldown filtering
-                original_rank = next((j+1 for j, u in enumerate(sorted_users) if u['user_id'] == user['user_id']), "?")
-                trickle_note = f" (trickled down from #{original_rank})" if original_rank > i + 1 else ""
-                print(f"     {i+1}. {user['name']}{trickle_note} - {user['best_relationship']} ({rel_count} relationships)")
+            logger.info(f"🔄 TRICKLE DOWN: Final selection from {len(available_users)} available users:")
+            if logger.isEnabledFor(logging.DEBUG):
+                # Original ranking before cooldown filtering
+                original_ranks = {u['user_id']: j + 1 for j, u in enumerate(sorted_users)}
+                for i, user in enumerate(top_users):
+                    rel_count = len(user['relationships'])
+                    original_rank = original_ranks.get(user['user_id'], i + 1)
+                    trickle_note = f" (trickled down from #{original_rank})" if original_rank > i + 1 else ""
+                    logger.debug(f"     {i+1}. {user['name']}{trickle_note} - {user['best_relationship']} ({rel_count} relationships)")
         else:
-            print(f"⚠️ TRICKLE DOWN: No available users after cooldown filtering")
+            logger.warning(f"⚠️ TRICKLE DOWN: No available users after cooldown filtering")
         
         processing_time = time.time() - start_time
-        print(f"🔍 USER SUGGESTION: Complete ({processing_time:.2f}s)")
+        logger.info(f"🔍 USER SUGGESTION: Complete ({processing_time:.2f}s)")
         
         return suggestions
         
     except Exception as e:
         processing_time = time.time() - start_time
-        print(f"❌ USER SUGGESTION FAILED: {e} ({processing_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ USER SUGGESTION FAILED: {e} ({processing_time:.2f}s)")
         return None
 
 def format_user_suggestions_with_personality(suggestions, original_message):
@@ -759,14 +1305,13 @@ def format_user_suggestions_with_personality(suggestions, original_message):
     Returns:
         str: LLM-generated warm tagging response
     """
-    import time
     start_time = time.time()
     
     if not suggestions or not suggestions['users']:
-        print(f"❌ LLM FORMATTING: No suggestions provided")
+        logger.error(f"❌ LLM FORMATTING: No suggestions provided")
         return None
     
-    print(f"🎭 LLM FORMATTING: Generating warm response for {len(suggestions['users'])} users")
+    logger.info(f"🎭 LLM FORMATTING: Generating warm response for {len(suggestions['users'])} users")
     
     try:
         # Prepare context for the LLM
@@ -793,9 +1338,9 @@ def format_user_suggestions_with_personality(suggestions, original_message):
             
             user_context.append(f"<@{user_id}> ({name} - {expertise})")
         
-        print(f"   Topics: {topics}")
-        print(f"   Users: {[u['name'] for u in users[:3]]}")
-        print(f"   Original message preview: {original_message[:60]}...")
+        logger.info(f"   Topics: {topics}")
+        logger.info(f"   Users: {[u['name'] for u in users[:3]]}")
+        logger.info(f"   Original message preview: {original_message[:60]}...")
         
         # Analyze message characteristics for context-aware response
         message_length = len(original_message.split())
@@ -804,8 +1349,8 @@ def format_user_suggestions_with_personality(suggestions, original_message):
         is_casual = any(word in original_message.lower() for word in ['hey', 'yo', 'sup', 'lol', 'haha'])
         is_technical = any(word in original_message.lower() for word in ['algorithm', 'model', 'architecture', 'implementation'])
         
-        print(f"   📊 Message analysis: {message_length} words | Question: {has_question} | Excited: {has_excitement} | Casual: {is_casual} | Technical: {is_technical}")
-        print(f"   🎯 Using o3-mini model with enhanced context awareness")
+        logger.info(f"   📊 Message analysis: {message_length} words | Question: {has_question} | Excited: {has_excitement} | Casual: {is_casual} | Technical: {is_technical}")
+        logger.info(f"   🎯 Using o3-mini model with enhanced context awareness")
         
         # Create enhanced context for the LLM
         context = f"""You need to generate a tagging response that matches the tone and style of the original message AND customizes based on each person's relationship type.
@@ -836,7 +1381,7 @@ TASK: Generate ONE LINE that tags people while customizing the language based on
         
         # Get LLM response using o3 for better contextual formatting
         llm_start = time.time()
-        client = OpenAI()
+        client = get_openai_client()
         response = client.responses.create(
             model="o3-mini", 
             input=[
@@ -848,45 +1393,43 @@ TASK: Generate ONE LINE that tags people while customizing the language based on
         )
         llm_time = time.time() - llm_start
         
-        print(f"   o3-mini API call completed ({llm_time:.2f}s)")
+        logger.info(f"   o3-mini API call completed ({llm_time:.2f}s)")
         
         if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-            print("   ⚠️ Token limit reached during response generation")
+            logger.warning("   ⚠️ Token limit reached during response generation")
             if response.output_text:
                 warm_response = response.output_text.strip()
-                print(f"   Partial response recovered: {warm_response}")
+                logger.info(f"   Partial response recovered: {warm_response}")
             else:
-                print("   ❌ No response text available - token limit hit during reasoning")
+                logger.error("   ❌ No response text available - token limit hit during reasoning")
                 return None
         else:
             warm_response = response.output_text.strip()
-            print(f"   ✅ Full response generated: {warm_response}")
+            logger.info(f"   ✅ Full response generated: {warm_response}")
         
         # Validate response quality
         if not warm_response:
-            print(f"   ❌ Empty response from LLM")
+            logger.error(f"   ❌ Empty response from LLM")
             return None
         
         # Check if response contains user mentions
         mentioned_users = [u for u in users if f"<@{u['user_id']}>" in warm_response]
-        print(f"   Response mentions {len(mentioned_users)} users")
+        logger.info(f"   Response mentions {len(mentioned_users)} users")
         
         if not mentioned_users:
-            print(f"   ⚠️ Response doesn't mention any users - may be malformed")
+            logger.warning(f"   ⚠️ Response doesn't mention any users - may be malformed")
         
         total_time = time.time() - start_time
-        print(f"🎭 LLM FORMATTING: Complete ({total_time:.2f}s)")
+        logger.info(f"🎭 LLM FORMATTING: Complete ({total_time:.2f}s)")
         
         return warm_response
         
     except Exception as e:
         total_time = time.time() - start_time
-        print(f"❌ LLM FORMATTING FAILED: {e} ({total_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ LLM FORMATTING FAILED: {e} ({total_time:.2f}s)")
         
         # Fallback to simple format
-        print(f"   🔄 Falling back to simple formatting")
+        logger.info(f"   🔄 Falling back to simple formatting")
         return format_user_suggestions_simple(suggestions)
 
 def format_user_suggestions_simple(suggestions):
@@ -926,7 +1469,11 @@ def format_user_suggestions(suggestions, original_message=""):
 
 def should_suggest_users(channel_id, topics, last_suggestion_time=None):
     """
-    Determine if we should suggest users using o3-mini mini agent.
+    Cached wrapper around decide_should_suggest_users.
+    
+    Decisions for the same channel and topic set are reused for CHANNEL_TAG_COOLDOWN
+    seconds, so repeated checks skip the o3-mini call. Heuristic fallbacks taken
+    after an o3-mini failure are not cached, so the next check asks o3-mini again.
     
     Args:
         channel_id (str): Channel ID
@@ -936,19 +1483,49 @@ def should_suggest_users(channel_id, topics, last_suggestion_time=None):
     Returns:
         bool: Whether to suggest users
     """
-    import time
+    key = (channel_id, frozenset(topics))
+    with suggestion_decision_lock:
+        cached = suggestion_decision_cache.get(key)
+        if cached and time.time() - cached[1] < CHANNEL_TAG_COOLDOWN:
+            suggestion_decision_cache.move_to_end(key)
+            logger.info(f"🤔 SHOULD SUGGEST: Cached decision {cached[0]} for channel {channel_id}")
+            return cached[0]
+    
+    decision, used_fallback = decide_should_suggest_users(channel_id, topics, last_suggestion_time)
+    if used_fallback:
+        return decision
+    
+    with suggestion_decision_lock:
+        suggestion_decision_cache[key] = (decision, time.time())
+        suggestion_decision_cache.move_to_end(key)
+        if len(suggestion_decision_cache) > SUGGESTION_DECISION_CACHE_SIZE:
+            suggestion_decision_cache.popitem(last=False)
+    return decision
+
+def decide_should_suggest_users(channel_id, topics, last_suggestion_time=None):
+    """
+    Determine if we should suggest users using o3-mini mini agent.
+    
+    Args:
+        channel_id (str): Channel ID
+        topics (list): Topics being discussed
+        last_suggestion_time (datetime, optional): Last time suggestions were made
+    
+    Returns:
+        tuple: (whether to suggest users, whether the heuristic fallback was used)
+    """
     start_time = time.time()
     
-    print(f"🤔 SHOULD SUGGEST: Evaluating for channel {channel_id} using o3-mini")
-    print(f"   Topics: {topics}")
+    logger.info(f"🤔 SHOULD SUGGEST: Evaluating for channel {channel_id} using o3-mini")
+    logger.info(f"   Topics: {topics}")
     
     if not topics:
-        print(f"   ❌ No topics provided")
-        return False
+        logger.error(f"   ❌ No topics provided")
+        return False, False
     
     if len(topics) > 8:  # Hard limit to avoid overwhelming
-        print(f"   ❌ Too many topics ({len(topics)}) - avoiding overwhelming discussions")
-        return False
+        logger.error(f"   ❌ Too many topics ({len(topics)}) - avoiding overwhelming discussions")
+        return False, False
     
     try:
         # Create prompt for mini agent to decide
@@ -957,7 +1534,7 @@ def should_suggest_users(channel_id, topics, last_suggestion_time=None):
 
         # Call o3-mini
         llm_start = time.time()
-        client = OpenAI()
+        client = get_openai_client()
         response = client.responses.create(
             model="o3-mini",
             reasoning={"effort": "low"},
@@ -970,42 +1547,40 @@ def should_suggest_users(channel_id, topics, last_suggestion_time=None):
         )
         llm_time = time.time() - llm_start
         
-        print(f"   o3-mini decision call completed ({llm_time:.2f}s)")
+        logger.info(f"   o3-mini decision call completed ({llm_time:.2f}s)")
         
         # Handle response
         if response.status == "incomplete" and response.incomplete_details.reason == "max_output_tokens":
-            print("   ⚠️ Token limit reached during decision")
+            logger.warning("   ⚠️ Token limit reached during decision")
             if response.output_text:
                 decision = response.output_text.strip().upper()
-                print(f"   Partial decision recovered: {decision}")
+                logger.info(f"   Partial decision recovered: {decision}")
             else:
-                print("   ❌ No decision available - defaulting to NO")
-                return False
+                logger.error("   ❌ No decision available - defaulting to NO")
+                return False, False
         else:
             decision = response.output_text.strip().upper()
-            print(f"   ✅ Full decision received: {decision}")
+            logger.info(f"   ✅ Full decision received: {decision}")
         
         # Parse decision
         should_suggest = decision == "YES"
         
         total_time = time.time() - start_time
-        print(f"🤔 SHOULD SUGGEST: Decision '{decision}' → {should_suggest} ({total_time:.2f}s)")
+        logger.info(f"🤔 SHOULD SUGGEST: Decision '{decision}' → {should_suggest} ({total_time:.2f}s)")
         
-        return should_suggest
+        return should_suggest, False
         
     except Exception as e:
         total_time = time.time() - start_time
-        print(f"❌ SHOULD SUGGEST FAILED: {e} ({total_time:.2f}s)")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ SHOULD SUGGEST FAILED: {e} ({total_time:.2f}s)")
         
         # Conservative fallback - only suggest for clearly tech topics
-        print(f"   🔄 Falling back to conservative heuristic")
+        logger.info(f"   🔄 Falling back to conservative heuristic")
         tech_keywords = ['ai', 'ml', 'machine learning', 'artificial intelligence', 
                         'data', 'software', 'programming', 'robotics', 'research']
         
         has_tech = any(keyword in topic.lower() for topic in topics for keyword in tech_keywords)
         fallback_decision = has_tech and len(topics) <= 3
         
-        print(f"   Fallback decision: {fallback_decision} (has_tech={has_tech}, topic_count={len(topics)})")
-        return fallback_decision 
\ No newline at end of file
+        logger.info(f"   Fallback decision: {fallback_decision} (has_tech={has_tech}, topic_count={len(topics)})")
+        return fallback_decision, True 
\ No newline at end of file